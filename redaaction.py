@@ -14,11 +14,10 @@ Ultra-high precision PDF redaction with intelligent text selection and PII detec
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import Image, ImageTk, ImageDraw, ImageFont, ImageColor
 import fitz  # PyMuPDF
 import re
 import os
-import io
 import json
 import webbrowser
 import random
@@ -28,6 +27,14 @@ import shutil
 import tempfile
 from tkinter import simpledialog
 import threading
+import queue
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from multiprocessing.managers import BaseManager
+from array import array
+import itertools
+import weakref
 
 # PII Detection imports
 import os
@@ -58,6 +65,14 @@ for group in CORE_DEPENDENCIES:
 
 DEPENDENCIES_LOADED = all(DEPENDENCIES_STATUS.values())
 
+# Optional multi-pattern matcher, used as a single-pass prefilter when installed
+HYPERSCAN_AVAILABLE = check_import('hyperscan')
+
+# Optional vectorized geometry for merging large numbers of redaction boxes
+NUMPY_AVAILABLE = check_import('numpy')
+if NUMPY_AVAILABLE:
+    import numpy as np
+
 if True:  # Always try to import what's available
     try:
         # Basic image processing
@@ -71,38 +86,65 @@ if True:  # Always try to import what's available
             except ImportError:
                 import PyMuPDF as fitz  # Fallback name
         
-        # PII detection if available
-        if DEPENDENCIES_STATUS['pii_detection']:
-            from presidio_analyzer import AnalyzerEngine
-            from presidio_analyzer.nlp_engine import NlpEngineProvider
-            from presidio_anonymizer import AnonymizerEngine
-            from presidio_anonymizer.entities import OperatorConfig
-        
-        # NLP features if available
-        if DEPENDENCIES_STATUS['nlp']:
-            import spacy
-            try:
-                import en_core_web_lg
-            except ImportError:
-                pass  # Will download later if needed
-        
-        # Advanced NLP if available
-        if DEPENDENCIES_STATUS['advanced_nlp']:
-            try:
-                from transformers import pipeline
-            except ImportError:
-                pass
-                
-            try:
-                from flair.models import SequenceTagger
-                from flair.data import Sentence
-            except ImportError:
-                pass
-                
     except ImportError as e:
         print(f"Warning: Some imports failed - {str(e)}")
         # Continue with reduced functionality
 
+class LazyBackend:
+    """An optional NLP stack imported the first time it is used"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import the backend if needed and return its namespace"""
+        with self._lock:
+            if self._module is None:
+                print(f"Loading {self.name} backend...")
+                self._module = self._loader()
+            return self._module
+
+    def is_loaded(self):
+        """Check if the backend was imported already"""
+        return self._module is not None
+
+def _load_presidio():
+    from presidio_analyzer import AnalyzerEngine
+    from presidio_anonymizer import AnonymizerEngine
+    return SimpleNamespace(AnalyzerEngine=AnalyzerEngine, AnonymizerEngine=AnonymizerEngine)
+
+def _load_spacy():
+    import spacy
+    import spacy.cli
+    return spacy
+
+def _load_transformers():
+    from transformers import pipeline
+    return SimpleNamespace(pipeline=pipeline)
+
+def _load_flair():
+    from flair.models import SequenceTagger
+    from flair.data import Sentence
+    return SimpleNamespace(SequenceTagger=SequenceTagger, Sentence=Sentence)
+
+# Model stacks by backend name, imported on first use so regex-only runs start fast
+NLP_BACKENDS = {
+    "presidio": LazyBackend("presidio", _load_presidio),
+    "spacy": LazyBackend("spacy", _load_spacy),
+    "transformers": LazyBackend("transformers", _load_transformers),
+    "flair": LazyBackend("flair", _load_flair)
+}
+
+# Modules that must not be imported until a PII backend is used
+HEAVY_MODULES = ("spacy", "torch", "transformers", "flair", "presidio_analyzer", "presidio_anonymizer")
+
+def nlp_backend(name):
+    """Namespace of an NLP backend, importing it on first use"""
+    return NLP_BACKENDS[name].load()
+
 def check_dependencies():
     """Check if all required dependencies are available and install if needed"""
     global DEPENDENCIES_LOADED, DEPENDENCIES_STATUS
@@ -294,6 +336,61 @@ def check_dependencies():
         return False
     return True
 
+# Memory budget for rendered pages kept by the viewer
+RENDER_CACHE_MB = 256
+
+# Memory budget for pattern hit offsets kept by the hit index
+HIT_INDEX_MB = 128
+
+# Pages on each side of the current one rendered ahead in the background
+PREFETCH_RADIUS = 2
+
+# Quiet period after paging or zooming before neighbouring pages are prefetched
+PREFETCH_SETTLE_MS = 400
+
+# Pages larger than this many pixels at the current zoom are rendered as tiles
+TILED_RENDER_MIN_PIXELS = 4096 * 4096
+TILE_SIZE = 512
+TILE_MARGIN = 1
+
+# Patterns with at least this many hits on a page are drawn as one overlay image
+OVERLAY_MIN_HITS = 200
+OVERLAY_ALPHA = 80
+
+# Quiet period before a requested preview starts, so bursts of clicks run once
+PREVIEW_DEBOUNCE_MS = 150
+
+# Documents with at least this many pages are analyzed across a process pool
+PARALLEL_ANALYSIS_MIN_PAGES = 64
+ANALYSIS_SHARD_PAGES = 25
+
+# Texts per NER forward pass, and pages handed to the NER model per call
+PII_BATCH_SIZE = 8
+PII_BATCH_PAGES = 32
+
+# Long texts are split into overlapping token windows for transformer NER
+PII_WINDOW_TOKENS = 510
+PII_WINDOW_OVERLAP = 64
+
+# Tokens left unused in each window, since a chunk cut out of a longer text can
+# tokenize into a few more tokens than it did in context
+PII_WINDOW_MARGIN = 16
+
+# Memory budget for NER models kept loaded, least recently used ones are unloaded first
+MODEL_CACHE_MB = 3072
+
+# Shared NER server: TCP port where Unix sockets are unavailable, and the
+# environment variable that points the GUI at a running server
+NER_SERVER_PORT = 50731
+NER_SERVER_ENV = "REDAACTION_NER_SERVER"
+
+# MuPDF is not thread-safe, so every background access to a document holds this
+FITZ_LOCK = threading.RLock()
+
+# Caches keyed by document, told to drop an in-memory document's entries when it closes
+DOCUMENT_CACHES = weakref.WeakSet()
+MEMORY_DOCUMENT_IDS = itertools.count(1)
+
 # Suppress console output for EXE deployment
 if getattr(sys, 'frozen', False):
     import sys
@@ -728,6 +825,11 @@ class TextSelectionHandler:
         self.is_selecting = True
         self.selected_text = ""
         
+        # Show which pattern a clicked highlight belongs to
+        hit = self.parent_app.highlight_at(pdf_x, pdf_y)
+        if hit:
+            self.parent_app.status_text.set(f"🎯 {hit[0]}: {hit[1]}")
+        
         # Clear previous selection rectangle
         if self.selection_rect_id:
             canvas.delete(self.selection_rect_id)
@@ -817,8 +919,10 @@ class TextSelectionHandler:
             if not self.parent_app.pdf_path or not self.selection_start or not self.selection_end:
                 return
                 
-            doc = fitz.open(self.parent_app.pdf_path)
-            page = doc[self.parent_app.current_page]
+            # The pooled document is shared with the prefetch and index threads
+            with FITZ_LOCK:
+                page = self.parent_app.get_document()[self.parent_app.current_page]
+                page_model = PAGE_TEXT_CACHE.get(page)
             
             # Create selection rectangle
             x1, x2 = min(self.selection_start[0], self.selection_end[0]), max(self.selection_start[0], self.selection_end[0])
@@ -827,10 +931,10 @@ class TextSelectionHandler:
             selection_rect = fitz.Rect(x1, y1, x2, y2)
             
             # Get text within selection area
-            words = page.get_text("words")
+            words = page_model.words
             selected_words = []
             
-            for word_data in words:
+            for word_index, word_data in enumerate(words):
                 word_x0, word_y0, word_x1, word_y1, word_text, block_no, line_no, word_no = word_data
                 word_rect = fitz.Rect(word_x0, word_y0, word_x1, word_y1)
                 
@@ -841,21 +945,16 @@ class TextSelectionHandler:
                         # Entire word is selected
                         selected_words.append(word_text)
                     else:
-                        # Partial word selection - estimate characters
+                        # Partial word selection - characters whose glyphs are covered
                         overlap = selection_rect & word_rect
                         if overlap.width > 0 and overlap.height > 0:
-                            # Calculate which part of the word is selected
-                            word_width = word_rect.width
-                            char_width = word_width / len(word_text) if len(word_text) > 0 else word_width
-                            
-                            start_char = max(0, int((overlap.x0 - word_rect.x0) / char_width))
-                            end_char = min(len(word_text), int((overlap.x1 - word_rect.x0) / char_width) + 1)
+                            partial_text = page_model.word_chars_in_range(
+                                word_index, overlap.x0, overlap.x1)
                             
-                            if start_char < end_char:
-                                selected_words.append(word_text[start_char:end_char])
+                            if partial_text:
+                                selected_words.append(partial_text)
             
             self.selected_text = ' '.join(selected_words).strip()
-            doc.close()
                         
         except Exception as e:
             print(f"Error getting selection text: {e}")
@@ -883,11 +982,11 @@ class TextSelectionHandler:
             if not self.parent_app.pdf_path:
                 return
                 
-            doc = fitz.open(self.parent_app.pdf_path)
-            page = doc[self.parent_app.current_page]
-            
-            # Use PyMuPDF's built-in word detection
-            words = page.get_text("words")  # Get word-level data
+            with FITZ_LOCK:
+                page = self.parent_app.get_document()[self.parent_app.current_page]
+                
+                # Use PyMuPDF's built-in word detection
+                words = PAGE_TEXT_CACHE.get(page).words  # Get word-level data
             
             # Find the word at the clicked position
             for word_data in words:
@@ -897,10 +996,8 @@ class TextSelectionHandler:
                 # Check if click is within this word
                 if word_rect.contains(fitz.Point(pdf_x, pdf_y)):
                     self.selected_text = word_text.strip()
-                    doc.close()
                     return
             
-            doc.close()
             self.selected_text = ""
                         
         except Exception as e:
@@ -990,44 +1087,232 @@ class TextSelectionHandler:
                 regex = pattern_info["generator"](self.selected_text)
                 label = f"{pattern_type}: {self.selected_text}"
         
-            # Check for duplicates
-            for existing_pattern in self.parent_app.patterns:
-                if existing_pattern["label"] == label:
-                    messagebox.showwarning("Warning", f"Pattern '{label}' already exists.")
-                    return
-        
-            color = self.parent_app.generate_random_color()
-        
-            new_pattern = {
-                "label": label,
-                "regex": regex,
-                "color": color,
-                "type": "selection"
-            }
-        
-            # Add to patterns
-            self.parent_app.patterns.append(new_pattern)
-            self.parent_app.add_pattern_display(color, label, len(self.parent_app.patterns) - 1, regex)
-            self.parent_app.update_pattern_count()
+            # Add to patterns, previewing only the new one
+            if not self.parent_app.add_pattern(label, regex, "selection"):
+                return
+                
             self.parent_app.status_text.set(f"➕ Added pattern from selection: {label}")
         
-            # AUTO-PREVIEW the new pattern
-            if self.parent_app.pdf_path:
-                self.parent_app.ultra_precise_preview()
-        
         except Exception as e:
             messagebox.showerror("Error", f"Failed to create pattern: {str(e)}")
 
+class TextChunker:
+    """Splits long text into overlapping token windows and maps entities back to text offsets"""
+
+    def __init__(self, window=PII_WINDOW_TOKENS, overlap=PII_WINDOW_OVERLAP, tokenizer=None):
+        self.window = max(2, window)
+        self.overlap = min(max(0, overlap), self.window - 1)
+        self.tokenizer = tokenizer
+
+    def token_spans(self, text):
+        """Character span of every token, from the model tokenizer when it reports offsets"""
+        if self.tokenizer is not None and getattr(self.tokenizer, "is_fast", False):
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            return [(start, end) for start, end in encoding["offset_mapping"] if end > start]
+
+        return [match.span() for match in re.finditer(r"\S+", text)]
+
+    def chunks(self, text):
+        """Windows as (start, end, keep_start, keep_end) character offsets
+
+        Consecutive windows share `overlap` tokens. Each window keeps only the
+        entities starting in its keep range; keep ranges tile the text and
+        stop half an overlap before a window edge, so every entity is seen
+        with context on both sides and kept exactly once."""
+        spans = self.token_spans(text)
+        if len(spans) <= self.window:
+            return [(0, len(text), 0, len(text))]
+
+        step = self.window - self.overlap
+        starts = list(range(0, len(spans) - self.overlap, step))
+
+        chunks = []
+        for number, first in enumerate(starts):
+            last = min(first + self.window, len(spans)) - 1
+            keep_start = 0 if number == 0 else spans[first + self.overlap // 2][0]
+            chunks.append([spans[first][0], spans[last][1], keep_start, len(text)])
+
+        # Each keep range ends where the next one starts
+        for current, following in zip(chunks, chunks[1:]):
+            current[3] = following[2]
+
+        return [tuple(chunk) for chunk in chunks]
+
+    @staticmethod
+    def merge(parts):
+        """Combine per-window entities into text offsets, dropping seam duplicates"""
+        merged = []
+        seen = set()
+
+        for (start, end, keep_start, keep_end), entities in parts:
+            for entity in entities:
+                entity = dict(entity, start=entity["start"] + start, end=entity["end"] + start)
+                key = (entity["start"], entity["end"], entity["entity"])
+
+                if not keep_start <= entity["start"] < keep_end or key in seen:
+                    continue
+                seen.add(key)
+                merged.append(entity)
+
+        merged.sort(key=lambda entity: entity["start"])
+        return merged
+
+def process_rss():
+    """Resident memory of this process in bytes, or None where it can't be read"""
+    if check_import('psutil'):
+        import psutil
+        return psutil.Process().memory_info().rss
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def model_bytes(model):
+    """Memory held by a model's weights, or None for models we can't inspect"""
+    # Transformers pipelines wrap the torch module
+    module = getattr(model, "model", model)
+
+    if hasattr(module, "parameters") and callable(module.parameters):
+        try:
+            tensors = list(module.parameters()) + list(module.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return None
+
+    # spaCy pipelines are dominated by their word vectors
+    vectors = getattr(getattr(model, "vocab", None), "vectors", None)
+    data = getattr(vectors, "data", None)
+    if data is not None and getattr(data, "nbytes", 0):
+        return int(data.nbytes)
+    return None
+
+class ModelCache:
+    """LRU cache of loaded NER models bounded by a memory budget"""
+
+    # Typical resident size per backend, used to make room before a model's first load
+    ESTIMATED_MB = {"spaCy": 800, "flair": 2200, "HuggingFace": 500}
+
+    def __init__(self, max_mb=MODEL_CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.nbytes = 0
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def backend(model_name):
+        """Backend a model name belongs to, e.g. 'spaCy' for 'spaCy/en_core_web_lg'"""
+        return model_name.split("/", 1)[0]
+
+    def __contains__(self, model_name):
+        with self._lock:
+            return model_name in self._models
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._models))
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, model_name):
+        """Return a loaded model or None"""
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is not None:
+                self._models.move_to_end(model_name)
+            return model
+
+    def load(self, model_name, loader):
+        """Return a model, calling loader() and evicting older models if it isn't loaded yet"""
+        with self._lock:
+            model = self.get(model_name)
+            if model is not None:
+                return model
+
+            # Make room before loading so the old and new models are never resident together
+            expected = self._sizes.get(model_name)
+            if expected is None:
+                expected = self.ESTIMATED_MB.get(self.backend(model_name), 0) * 1024 * 1024
+            self._evict(expected)
+
+            rss_before = process_rss()
+            model = loader()
+            rss_after = process_rss()
+
+            # Weight sizes are exact, the RSS delta also counts first-time imports
+            size = model_bytes(model)
+            if size is None and rss_before is not None and rss_after is not None:
+                size = max(rss_after - rss_before, 0)
+
+            self._sizes[model_name] = size or 0
+            self._models[model_name] = model
+            self.nbytes += self._sizes[model_name]
+            self._evict()
+            return model
+
+    def usage(self):
+        """(model name, backend, resident MB) for each loaded model, least recently used first"""
+        with self._lock:
+            return [(name, self.backend(name), self._sizes.get(name, 0) / (1024 * 1024))
+                    for name in self._models]
+
+    def set_budget(self, max_mb):
+        """Change the memory budget, unloading models immediately if needed"""
+        with self._lock:
+            self.max_bytes = int(max_mb * 1024 * 1024)
+            self._evict()
+
+    def clear(self):
+        """Unload every model"""
+        with self._lock:
+            self._models.clear()
+            self.nbytes = 0
+        self._release_memory()
+
+    def _evict(self, incoming=0):
+        # The most recently used model always stays, even if it alone exceeds the budget
+        evicted = False
+        while self._models and self.nbytes + incoming > self.max_bytes:
+            if not incoming and len(self._models) == 1:
+                break
+            name, _ = self._models.popitem(last=False)
+            self.nbytes -= self._sizes.get(name, 0)
+            print(f"Unloaded {name} from model cache")
+            evicted = True
+
+        if evicted:
+            self._release_memory()
+
+    @staticmethod
+    def _release_memory():
+        import gc
+        gc.collect()
+
+        # Only touch torch if a model already imported it
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+# One budget for every detector in the process
+MODEL_CACHE = ModelCache(max_mb=MODEL_CACHE_MB)
+
 class PIIDetector:
     """Handles PII detection using various NLP models"""
     
-    def __init__(self):
-        self.models = {}
-        self.current_model = None
+    def __init__(self, interactive=True):
+        # Headless users (batch workers, the NER server) get errors printed, not dialogs
+        self.interactive = interactive
+        self.models = MODEL_CACHE
+        self.current_model_name = None
         self.analyzer = None
         self.anonymizer = None
         self.threshold = 0.35
         self.is_initialized = False
+        self.window_tokens = PII_WINDOW_TOKENS
+        self.window_overlap = PII_WINDOW_OVERLAP
         
         # Disable PII detection if dependencies aren't available
         if not DEPENDENCIES_LOADED:
@@ -1037,14 +1322,32 @@ class PIIDetector:
     def is_available(self):
         """Check if PII detection is available"""
         return DEPENDENCIES_LOADED
+
+    @property
+    def current_model(self):
+        """The current model from the shared cache, None once it has been unloaded"""
+        # Only the name is kept, so an evicted model has no reference left here
+        if self.current_model_name is None:
+            return None
+        return self.models.get(self.current_model_name)
+
+    def show_message(self, title, message, level="error"):
+        """Show an error or warning dialog, unless running headless"""
+        if not self.interactive:
+            return
+        if level == "warning":
+            messagebox.showwarning(title, message)
+        else:
+            messagebox.showerror(title, message)
         
     def ensure_initialized(self):
         """Ensure the detector is initialized"""
         if not self.is_initialized and DEPENDENCIES_LOADED:
             try:
                 # Initialize Presidio components
-                self.analyzer = AnalyzerEngine()
-                self.anonymizer = AnonymizerEngine()
+                presidio = nlp_backend("presidio")
+                self.analyzer = presidio.AnalyzerEngine()
+                self.anonymizer = presidio.AnonymizerEngine()
                 self.is_initialized = True
                 return True
             except Exception as e:
@@ -1052,54 +1355,64 @@ class PIIDetector:
                 return False
         return self.is_initialized
         
+    def load_model(self, model_name):
+        """Load an NLP model by name if needed and make it current, raises on failure"""
+        self.current_model_name = model_name
+        model = self.models.load(model_name, lambda: self._create_model(model_name))
+
+        for name, backend, size_mb in self.models.usage():
+            print(f"Model cache: {name} ({backend}) {size_mb:.0f} MB")
+        print(f"Model loaded successfully: {type(model).__name__}")
+        return model
+
+    def _create_model(self, model_name):
+        """Load a fresh NLP model for a model name"""
+        if model_name.startswith("spaCy"):
+            print("Loading spaCy model...")
+            spacy = nlp_backend("spacy")
+            try:
+                return spacy.load("en_core_web_lg")
+            except OSError:
+                print("Downloading spaCy model...")
+                spacy.cli.download("en_core_web_lg")
+                return spacy.load("en_core_web_lg")
+
+        elif model_name.startswith("flair"):
+            try:
+                print("Loading Flair model...")
+                print("Creating Flair SequenceTagger...")
+                model = nlp_backend("flair").SequenceTagger.load("flair/ner-english-large")
+                print("SequenceTagger created successfully")
+                return model
+            except Exception as e:
+                print(f"Error loading Flair model: {str(e)}")
+                raise
+
+        elif model_name.startswith("HuggingFace"):
+            try:
+                print("Loading Transformer model...")
+                model = nlp_backend("transformers").pipeline("ner", 
+                              model="obi/deid_roberta_i2b2",
+                              aggregation_strategy="simple")
+                print("Pipeline created successfully")
+                return model
+            except Exception as e:
+                print(f"Error loading Transformer model: {str(e)}")
+                raise
+
+        raise ValueError(f"Unknown model: {model_name}")
+        
     def initialize_models(self, model_name):
         """Initialize selected NLP model"""
         try:
             print(f"\nInitializing model: {model_name}")
-            self.current_model_name = model_name
-            
-            if model_name not in self.models:
-                if model_name.startswith("spaCy"):
-                    print("Loading spaCy model...")
-                    try:
-                        self.models[model_name] = spacy.load("en_core_web_lg")
-                    except OSError:
-                        print("Downloading spaCy model...")
-                        spacy.cli.download("en_core_web_lg")
-                        self.models[model_name] = spacy.load("en_core_web_lg")
-                        
-                elif model_name.startswith("flair"):
-                    try:
-                        print("Loading Flair model...")
-                        print("Creating Flair SequenceTagger...")
-                        model = SequenceTagger.load("flair/ner-english-large")
-                        print("SequenceTagger created successfully")
-                        self.models[model_name] = model
-                        print("Model stored in models dictionary")
-                    except Exception as e:
-                        print(f"Error loading Flair model: {str(e)}")
-                        raise
-                    
-                elif model_name.startswith("HuggingFace"):
-                    try:
-                        print("Loading Transformer model...")
-                        model = pipeline("ner", 
-                                      model="obi/deid_roberta_i2b2",
-                                      aggregation_strategy="simple")
-                        print("Pipeline created successfully")
-                        self.models[model_name] = model
-                    except Exception as e:
-                        print(f"Error loading Transformer model: {str(e)}")
-                        raise
-            
-            print("Setting current model...")
-            self.current_model = self.models[model_name]
-            print(f"Model loaded successfully: {type(self.current_model).__name__}")
+            self.load_model(model_name)
             
             # Initialize Presidio components
             print("Initializing Presidio components...")
-            self.analyzer = AnalyzerEngine()
-            self.anonymizer = AnonymizerEngine()
+            presidio = nlp_backend("presidio")
+            self.analyzer = presidio.AnalyzerEngine()
+            self.anonymizer = presidio.AnonymizerEngine()
             print("Presidio components initialized")
             
             return True
@@ -1107,12 +1420,13 @@ class PIIDetector:
         except Exception as e:
             error_msg = f"Failed to initialize model: {str(e)}"
             print(f"Error: {error_msg}")
-            messagebox.showerror("Model Initialization Error", error_msg)
+            self.show_message("Model Initialization Error", error_msg)
             return False
             
             # Initialize Presidio
-            self.analyzer = AnalyzerEngine()
-            self.anonymizer = AnonymizerEngine()
+            presidio = nlp_backend("presidio")
+            self.analyzer = presidio.AnalyzerEngine()
+            self.anonymizer = presidio.AnonymizerEngine()
             
             return True
         except Exception as e:
@@ -1126,12 +1440,12 @@ class PIIDetector:
             
             if not self.current_model:
                 print("ERROR: No model loaded")
-                messagebox.showerror("Error", "No model is loaded. Please select a model first.")
+                self.show_message("Error", "No model is loaded. Please select a model first.")
                 return []
                 
             if not text.strip():
                 print("ERROR: Empty text")
-                messagebox.showwarning("Warning", "Please enter some text to analyze.")
+                self.show_message("Warning", "Please enter some text to analyze.", "warning")
                 return []
                 
             entities = []
@@ -1151,7 +1465,7 @@ class PIIDetector:
             if not model_info:
                 error_msg = f"Model info not found for {self.current_model_name}"
                 print(f"ERROR: {error_msg}")
-                messagebox.showerror("Error", error_msg)
+                self.show_message("Error", error_msg)
                 return []
                 
             print(f"Model type: {model_info['type']}")
@@ -1162,67 +1476,16 @@ class PIIDetector:
             print(f"Using model type: {model_type}")
             
             # Use appropriate detection method based on model type
-            if model_type == "spacy":
-                doc = self.current_model(text)
-                entities = [{"entity": ent.label_,
-                           "start": ent.start_char,
-                           "end": ent.end_char,
-                           "text": ent.text,
-                           "score": 0.8}  # spaCy doesn't provide confidence scores
-                          for ent in doc.ents]
-                print(f"spaCy found {len(doc.ents)} entities")
-                          
-            elif model_type == "flair":
-                try:
-                    sentence = Sentence(text)
-                    self.current_model.predict(sentence)
-                    print(f"Flair prediction completed")
-                    entities = []
-                    for ent in sentence.get_spans('ner'):
-                        entity = {
-                            "entity": ent.tag,
-                            "start": ent.start_pos,
-                            "end": ent.end_pos,
-                            "text": ent.text,
-                            "score": ent.score
-                        }
-                        print(f"Found entity: {entity}")
-                        entities.append(entity)
-                except Exception as e:
-                    print(f"Flair error: {str(e)}")
-                    return []
-                          
-            elif model_type == "transformers":
-                try:
-                    results = self.current_model(text)
-                    print(f"Transformer returned {len(results)} results")
-                    entities = []
-                    for ent in results:
-                        entity = {
-                            "entity": ent["entity_group"],
-                            "start": ent["start"],
-                            "end": ent["end"],
-                            "text": ent["word"],
-                            "score": ent["score"]
-                        }
-                        print(f"Found entity: {entity}")
-                        entities.append(entity)
-                except Exception as e:
-                    print(f"Transformer error: {str(e)}")
-                    return []
+            try:
+                entities = self._run_model([text], model_type)[0]
+            except Exception as e:
+                print(f"{model_type} error: {str(e)}")
+                return []
             
             print(f"Total entities before filtering: {len(entities)}")
             
             # Filter by selected types and threshold
-            if selected_types:
-                filtered_entities = []
-                for ent in entities:
-                    if ent["entity"] in selected_types and ent["score"] >= self.threshold:
-                        filtered_entities.append(ent)
-                        print(f"Keeping entity: {ent}")
-                    else:
-                        print(f"Filtering out entity: {ent}")
-                entities = filtered_entities
+            entities = self._filter_entities(entities, selected_types)
             
             print(f"Final entities after filtering: {len(entities)}")
             return entities
@@ -1231,6 +1494,117 @@ class PIIDetector:
             print(f"Error detecting entities: {e}")
             return []
             
+    def detect_entities_batch(self, texts, selected_types=None, batch_size=PII_BATCH_SIZE):
+        """Detect PII entities in many texts with batched inference, one entity list per text"""
+        texts = list(texts)
+        
+        model_info = NLP_MODELS.get(getattr(self, 'current_model_name', None))
+        if not self.current_model or not model_info:
+            print("ERROR: No model loaded")
+            return [[] for _ in texts]
+            
+        try:
+            results = self._run_model(texts, model_info["type"], batch_size)
+        except Exception as e:
+            print(f"Error detecting entities: {e}")
+            return [[] for _ in texts]
+            
+        return [self._filter_entities(entities, selected_types) for entities in results]
+        
+    def _run_model(self, texts, model_type, batch_size=PII_BATCH_SIZE):
+        """Run the current model over several texts, returns one entity list per text"""
+        results = [[] for _ in texts]
+        
+        # Models reject blank input, so only texts with content are sent
+        indexes = [i for i, text in enumerate(texts) if text.strip()]
+        batch = [texts[i] for i in indexes]
+        model = self.current_model
+        if not batch or model is None:
+            return results
+            
+        if model_type == "spacy":
+            for i, doc in zip(indexes, model.pipe(batch, batch_size=batch_size)):
+                results[i] = [{"entity": ent.label_,
+                               "start": ent.start_char,
+                               "end": ent.end_char,
+                               "text": ent.text,
+                               "score": 0.8}  # spaCy doesn't provide confidence scores
+                              for ent in doc.ents]
+                              
+        elif model_type == "flair":
+            Sentence = nlp_backend("flair").Sentence
+            
+            def predict(chunk_texts):
+                sentences = [Sentence(text) for text in chunk_texts]
+                model.predict(sentences, mini_batch_size=batch_size)
+                return [[{"entity": ent.tag,
+                          "start": ent.start_pos,
+                          "end": ent.end_pos,
+                          "text": ent.text,
+                          "score": ent.score}
+                         for ent in sentence.get_spans('ner')]
+                        for sentence in sentences]
+                        
+            for i, entities in zip(indexes, self._run_windowed(batch, predict, self.chunker_for(model_type))):
+                results[i] = entities
+                              
+        elif model_type == "transformers":
+            def predict(chunk_texts):
+                outputs = model(chunk_texts, batch_size=batch_size)
+                return [[{"entity": ent["entity_group"],
+                          "start": ent["start"],
+                          "end": ent["end"],
+                          "text": ent["word"],
+                          "score": ent["score"]}
+                         for ent in output]
+                        for output in outputs]
+                        
+            for i, entities in zip(indexes, self._run_windowed(batch, predict, self.chunker_for(model_type))):
+                results[i] = entities
+                              
+        return results
+        
+    def chunker_for(self, model_type):
+        """Token window chunker matching the current model's input limit"""
+        if model_type == "transformers":
+            tokenizer = getattr(self.current_model, "tokenizer", None)
+            window = self.window_tokens - PII_WINDOW_MARGIN
+            if tokenizer is not None:
+                # Room left for special tokens and re-tokenization within the model's maximum length
+                limit = (getattr(tokenizer, "model_max_length", window) -
+                         tokenizer.num_special_tokens_to_add() - PII_WINDOW_MARGIN)
+                window = min(window, limit) if limit > 0 else window
+            if not getattr(tokenizer, "is_fast", False):
+                # Without offsets the windows count words, often two or more subword tokens each
+                window //= 2
+            return TextChunker(window, self.window_overlap, tokenizer)
+            
+        # Flair splits on whitespace, a word is often two or more subword tokens
+        return TextChunker(self.window_tokens // 2, self.window_overlap // 2)
+        
+    @staticmethod
+    def _run_windowed(texts, predict, chunker):
+        """Run predict() over the windows of all texts as one batch, one entity list per text"""
+        windows = []
+        chunk_texts = []
+        for text_number, text in enumerate(texts):
+            for chunk in chunker.chunks(text):
+                windows.append((text_number, chunk))
+                chunk_texts.append(text[chunk[0]:chunk[1]])
+                
+        parts = [[] for _ in texts]
+        for (text_number, chunk), entities in zip(windows, predict(chunk_texts)):
+            parts[text_number].append((chunk, entities))
+            
+        return [TextChunker.merge(text_parts) for text_parts in parts]
+        
+    def _filter_entities(self, entities, selected_types=None):
+        """Keep entities of the selected types that reach the detector threshold"""
+        if not selected_types:
+            return entities
+        return [ent for ent in entities
+                if ent["entity"] in selected_types and ent["score"] >= self.threshold]
+            
     def mask_entities(self, text, entities, style="type_label"):
         """Mask detected entities using specified style"""
         try:
@@ -1310,6 +1684,146 @@ class PIIDetector:
             print(f"Style: {style}")
             return text  # Return original text on error
 
+def default_ner_address():
+    """Local address of the NER server, a per-user Unix socket where available"""
+    if os.name != "nt":
+        return os.path.join(tempfile.gettempdir(), f"redaaction-ner-{os.getuid()}.sock")
+    return ("127.0.0.1", NER_SERVER_PORT)
+
+def parse_ner_address(text):
+    """Turn 'host:port' into a TCP address and anything else into a socket path"""
+    if not text:
+        return default_ner_address()
+
+    host, _, port = text.rpartition(":")
+    if host and port.isdigit():
+        return (host, int(port))
+    return text
+
+def ner_authkey(create=False):
+    """Secret shared by the NER server and its clients, kept in the user's home directory"""
+    key_path = os.path.join(os.path.expanduser("~"), ".redaaction", "ner.key")
+
+    if not os.path.exists(key_path):
+        if not create:
+            raise FileNotFoundError(f"No NER server key at {key_path} - start one with 'serve-ner'")
+
+        import secrets
+        os.makedirs(os.path.dirname(key_path), exist_ok=True)
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(32))
+
+    with open(key_path, "rb") as f:
+        return f.read()
+
+class NERManager(BaseManager):
+    """Connection to the NER server process"""
+
+NERManager.register("ner")
+
+class NERService:
+    """Owns the NER models in the server process and runs batched detection for clients"""
+
+    def __init__(self):
+        self.detector = PIIDetector(interactive=False)
+        self._lock = threading.Lock()
+
+    def detect_batch(self, model_name, texts, selected_types=None, threshold=None):
+        """Entities for each text, loading the requested model on first use"""
+        # Connections are served on separate threads, the models are not thread-safe
+        with self._lock:
+            if (self.detector.current_model is None or
+                    getattr(self.detector, 'current_model_name', None) != model_name):
+                self.detector.load_model(model_name)
+
+            if threshold is not None:
+                self.detector.threshold = threshold
+
+            return self.detector.detect_entities_batch(texts, selected_types)
+
+    def status(self):
+        """Server process id and loaded models"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "models": self.detector.models.usage(),
+                "current": getattr(self.detector, 'current_model_name', None)
+            }
+
+def serve_ner(address=None, preload=None, cache_mb=MODEL_CACHE_MB):
+    """Run the NER server until interrupted, optionally loading a model up front"""
+    address = address or default_ner_address()
+    service = NERService()
+    service.detector.models.set_budget(cache_mb)
+
+    if preload:
+        service.detector.load_model(preload)
+
+    # Replace a socket file left behind by a server that is no longer running
+    if isinstance(address, str) and os.path.exists(address):
+        if RemotePIIDetector(preload or "", address).is_available():
+            raise RuntimeError(f"An NER server is already running on {address}")
+        os.remove(address)
+
+    NERManager.register("ner", callable=lambda: service)
+    server = NERManager(address=address, authkey=ner_authkey(create=True)).get_server()
+
+    print(f"NER server listening on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)
+
+class RemotePIIDetector:
+    """PII detector that sends batched texts to a running NER server"""
+
+    def __init__(self, model_name, address=None, threshold=0.35):
+        self.address = address or default_ner_address()
+        self.current_model_name = model_name
+        self.current_model = None
+        self.threshold = threshold
+        self._service = None
+
+    def connect(self):
+        """Proxy of the server's NER service, connecting on first use"""
+        if self._service is None:
+            manager = NERManager(address=self.address, authkey=ner_authkey())
+            manager.connect()
+            self._service = manager.ner()
+            self.current_model = self.current_model_name
+        return self._service
+
+    def is_available(self):
+        """Check if the NER server answers"""
+        try:
+            self.connect().status()
+            return True
+        except Exception as e:
+            print(f"NER server unavailable at {self.address}: {e}")
+            self._service = None
+            return False
+
+    def ensure_initialized(self):
+        """The server loads models itself, so being reachable is enough"""
+        return self.is_available()
+
+    def detect_entities_batch(self, texts, selected_types=None, batch_size=None):
+        """Detect PII entities in many texts on the server, one entity list per text"""
+        texts = list(texts)
+        try:
+            return self.connect().detect_batch(self.current_model_name, texts,
+                                               selected_types, self.threshold)
+        except Exception as e:
+            print(f"Error contacting NER server: {e}")
+            self._service = None
+            return [[] for _ in texts]
+
+    def detect_entities(self, text, selected_types=None):
+        """Detect PII entities in a single text on the server"""
+        return self.detect_entities_batch([text], selected_types)[0]
+
 class TextDeidentificationFrame(tk.Frame):
     """Text de-identification panel with NLP-based PII detection"""
     
@@ -1739,210 +2253,1798 @@ class TextDeidentificationFrame(tk.Frame):
                 
         threading.Thread(target=load, daemon=True).start()
 
-class UltraPrecisionRedactor:
-    """Ultra-precise redaction engine with perfect boundary detection"""
-    
-    @staticmethod
-    def find_ultra_precise_matches(page, regex_pattern):
-        """Ultra-precise text matching using word-level data - FIXED SYNTAX"""
-        matches = []
-        
+class PatternSet:
+    """Active patterns compiled once and scanned together, tagging each hit with its pattern"""
+
+    FLAGS = re.MULTILINE | re.IGNORECASE
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.invalid = []
+
+        # Identical regexes (e.g. phone and PNR numbers) share a single scan
+        self._groups = OrderedDict()
+        for index, pattern in enumerate(self.patterns):
+            regex = pattern["regex"]
+            if regex not in self._groups:
+                try:
+                    self._groups[regex] = (re.compile(regex, self.FLAGS), [])
+                except re.error as regex_error:
+                    print(f"Invalid regex in pattern {pattern['label']}: {regex_error}")
+                    self.invalid.append(index)
+                    self._groups[regex] = (None, [])
+            self._groups[regex][1].append(index)
+
+        self._compiled = [(compiled, indexes) for compiled, indexes in self._groups.values()
+                          if compiled is not None]
+        self._prefilter = None
+        self._unfiltered = set(range(len(self._compiled)))
+
+        if HYPERSCAN_AVAILABLE and len(self._compiled) > 1:
+            self._build_prefilter()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _build_prefilter(self):
+        """Compile a Hyperscan database that reports which patterns occur in a text"""
         try:
-            # Get word-level data for precise boundaries
-            words = page.get_text("words")
-            full_text = page.get_text()
-        
-            # Find regex matches in full text
-            for regex_match in re.finditer(regex_pattern, full_text, re.MULTILINE | re.IGNORECASE):
-                matched_text = regex_match.group().strip()
-        
-                if matched_text and len(matched_text) > 0:
-                    # For single character matches, use character-level precision
-                    if len(matched_text) == 1:
-                        char_rects = UltraPrecisionRedactor.get_character_level_boundaries(
-                            words, matched_text, regex_match.start(), regex_match.end()
-                        )
-                        for rect in char_rects:
-                            matches.append({
-                                'rect': rect,
-                                'text': matched_text
-                            })
-                    else:
-                        # Find the exact word boundaries using word-level data
-                        precise_rects = UltraPrecisionRedactor.get_word_level_boundaries(
-                            words, matched_text
-                        )
-                    
-                        for rect in precise_rects:
-                            matches.append({
-                                'rect': rect,
-                                'text': matched_text
-                            })
-                    
+            import hyperscan
+
+            flags = (hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_MULTILINE |
+                     hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 |
+                     hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_PREFILTER |
+                     hyperscan.HS_FLAG_ALLOWEMPTY)
+
+            # Patterns Hyperscan cannot express are always scanned with re
+            supported = []
+            for group_id, (compiled, indexes) in enumerate(self._compiled):
+                try:
+                    probe = hyperscan.Database()
+                    probe.compile(expressions=[compiled.pattern.encode("utf-8")],
+                                  ids=[group_id], elements=1, flags=[flags])
+                    supported.append(group_id)
+                except Exception:
+                    continue
+
+            if not supported:
+                return
+
+            database = hyperscan.Database()
+            database.compile(
+                expressions=[self._compiled[gid][0].pattern.encode("utf-8") for gid in supported],
+                ids=supported,
+                elements=len(supported),
+                flags=[flags] * len(supported)
+            )
+            self._prefilter = database
+            self._unfiltered = set(range(len(self._compiled))) - set(supported)
+
         except Exception as e:
-            print(f"Error in ultra-precise matching: {e}")
-        
-        return matches
+            print(f"Hyperscan prefilter unavailable, using re only: {e}")
+            self._prefilter = None
+            self._unfiltered = set(range(len(self._compiled)))
+
+    def _candidate_groups(self, text):
+        """Group ids that may match the text, found in one pass when Hyperscan is available"""
+        if self._prefilter is None:
+            return range(len(self._compiled))
+
+        found = set(self._unfiltered)
+
+        def on_match(group_id, start, end, flags, context):
+            found.add(group_id)
 
-    @staticmethod
-    def get_word_level_boundaries(words, target_text):
-        """Get precise boundaries using word-level data"""
-        precise_rects = []
-    
         try:
-            target_lower = target_text.lower()
-        
-            # Method 1: Exact word match
-            for word_data in words:
-                x0, y0, x1, y1, word_text, block_no, line_no, word_no = word_data
-            
-                if word_text.lower() == target_lower:
-                    precise_rects.append(fitz.Rect(x0, y0, x1, y1))
-        
-            if precise_rects:
-                return precise_rects
-        
-            # Method 2: Partial match within words
-            for word_data in words:
-                x0, y0, x1, y1, word_text, block_no, line_no, word_no = word_data
-            
-                if target_lower in word_text.lower():
-                    # Calculate precise position within the word
-                    word_lower = word_text.lower()
-                    start_pos = word_lower.find(target_lower)
-                
-                    if start_pos >= 0:
-                        word_width = x1 - x0
-                        char_width = word_width / len(word_text) if len(word_text) > 0 else word_width
-                    
-                        start_x = x0 + (start_pos * char_width)
-                        end_x = start_x + (len(target_text) * char_width)
-                    
-                        precise_rects.append(fitz.Rect(start_x, y0, end_x, y1))
-        
-            if precise_rects:
-                return precise_rects
-        
-            # Method 3: Multi-word match
-            text_parts = target_text.split()
-            if len(text_parts) > 1:
-                # Find consecutive words that match
-                for i in range(len(words) - len(text_parts) + 1):
-                    word_sequence = []
-                    for j in range(len(text_parts)):
-                        if i + j < len(words):
-                            word_sequence.append(words[i + j][4].lower())  # word_text
-                
-                    if ' '.join(word_sequence) == target_lower:
-                        # Create bounding rectangle for all words
-                        first_word = words[i]
-                        last_word = words[i + len(text_parts) - 1]
-                    
-                        combined_rect = fitz.Rect(
-                            first_word[0],  # x0 of first word
-                            min(first_word[1], last_word[1]),  # min y0
-                            last_word[2],   # x1 of last word
-                            max(first_word[3], last_word[3])   # max y1
-                        )
-                    
-                        precise_rects.append(combined_rect)
-        
+            self._prefilter.scan(text.encode("utf-8"), match_event_handler=on_match)
         except Exception as e:
-            print(f"Error in word-level boundaries: {e}")
-    
-        return precise_rects
-    
-    @staticmethod
-    def get_character_level_boundaries(words, target_char, match_start, match_end):
-        """Get precise boundaries for single character matches"""
-        precise_rects = []
-    
-        try:
-            target_lower = target_char.lower()
-        
-            # Find all occurrences of the character in words
-            for word_data in words:
-                x0, y0, x1, y1, word_text, block_no, line_no, word_no = word_data
-            
-                # Check each character in the word
-                for i, char in enumerate(word_text):
-                    if char.lower() == target_lower:
-                        # Calculate character position within word
-                        word_width = x1 - x0
-                        char_width = word_width / len(word_text) if len(word_text) > 0 else word_width
-                        
-                        char_x0 = x0 + (i * char_width)
-                        char_x1 = char_x0 + char_width
-                        
-                        precise_rects.append(fitz.Rect(char_x0, y0, char_x1, y1))
-        
+            print(f"Hyperscan scan failed, falling back to re: {e}")
+            return range(len(self._compiled))
+
+        return sorted(found)
+
+    def finditer(self, text):
+        """Yield (pattern_index, match) for every hit of every pattern in the text"""
+        for group_id in self._candidate_groups(text):
+            compiled, indexes = self._compiled[group_id]
+            for regex_match in compiled.finditer(text):
+                for index in indexes:
+                    yield index, regex_match
+
+class GlyphGeometry:
+    """Per-character glyph boxes of a page stored in compact float arrays"""
+
+    def __init__(self):
+        self.x0 = array('f')
+        self.y0 = array('f')
+        self.x1 = array('f')
+        self.y1 = array('f')
+        self.lines = array('i')
+
+    def __len__(self):
+        return len(self.lines)
+
+    def append(self, bbox, line_id):
+        """Add the glyph box for the next text offset"""
+        self.x0.append(bbox[0])
+        self.y0.append(bbox[1])
+        self.x1.append(bbox[2])
+        self.y1.append(bbox[3])
+        self.lines.append(line_id)
+
+    def append_break(self, line_id):
+        """Add a line break offset, which has no glyph"""
+        nan = float("nan")
+        self.x0.append(nan)
+        self.y0.append(nan)
+        self.x1.append(nan)
+        self.y1.append(nan)
+        self.lines.append(line_id)
+
+    def box(self, offset):
+        """Glyph box at a text offset, or None for line breaks"""
+        x0 = self.x0[offset]
+        if x0 != x0:  # NaN marks a line break
+            return None
+        return (x0, self.y0[offset], self.x1[offset], self.y1[offset])
+
+class PageTextModel:
+    """Text, words and glyph geometry extracted once per page"""
+
+    def __init__(self, page):
+        self.page_number = page.number
+
+        # Build everything from one rawdict pass so every offset maps to one glyph
+        text_flags = getattr(fitz, "TEXTFLAGS_TEXT", None)
+        if text_flags is None:
+            raw = page.get_text("rawdict")
+        else:
+            raw = page.get_text("rawdict", flags=text_flags)
+
+        chars = []
+        self.glyphs = GlyphGeometry()
+        self.words = []
+        self.word_spans = []
+        line_id = 0
+
+        for block_no, block in enumerate(raw.get("blocks", [])):
+            if block.get("type", 0) != 0:
+                continue
+            for line_no, line in enumerate(block.get("lines", [])):
+                line_start = len(chars)
+
+                for span in line.get("spans", []):
+                    for char in span.get("chars", []):
+                        chars.append(char["c"])
+                        self.glyphs.append(char["bbox"], line_id)
+
+                self._add_line_words(chars, line_start, block_no, line_no)
+
+                # Line break, same layout as page.get_text()
+                chars.append("\n")
+                self.glyphs.append_break(line_id)
+                line_id += 1
+
+        self.text = "".join(chars)
+
+    def _add_line_words(self, chars, line_start, block_no, line_no):
+        """Split a line into whitespace-delimited words, like page.get_text("words")"""
+        word_start = None
+        word_no = 0
+
+        for offset in range(line_start, len(chars) + 1):
+            is_space = offset == len(chars) or chars[offset].isspace()
+
+            if word_start is None and not is_space:
+                word_start = offset
+            elif word_start is not None and is_space:
+                bbox = self.union_box(word_start, offset)
+                if bbox is not None:
+                    self.words.append((*bbox, "".join(chars[word_start:offset]),
+                                       block_no, line_no, word_no))
+                    self.word_spans.append((word_start, offset))
+                    word_no += 1
+                word_start = None
+
+    def union_box(self, start, end):
+        """Bounding box of the glyphs in [start, end) on a single line"""
+        x0 = y0 = x1 = y1 = None
+
+        for offset in range(start, end):
+            box = self.glyphs.box(offset)
+            if box is None:
+                continue
+            if x0 is None:
+                x0, y0, x1, y1 = box
+            else:
+                x0 = min(x0, box[0])
+                y0 = min(y0, box[1])
+                x1 = max(x1, box[2])
+                y1 = max(y1, box[3])
+
+        if x0 is None:
+            return None
+        return (x0, y0, x1, y1)
+
+    def entity_spans(self, entities):
+        """(entity, start, end) for each entity and every other occurrence of its text on the page"""
+        spans = [(entity, entity["start"], entity["end"]) for entity in entities]
+        covered = [(start, end) for _, start, end in spans]
+
+        # NER reports one occurrence, search_for used to catch the repeats as well
+        seen = set()
+        for entity in entities:
+            needle = (entity.get("text") or self.text[entity["start"]:entity["end"]]).strip()
+            if len(needle) < 2 or needle.lower() in seen:
+                continue
+            seen.add(needle.lower())
+
+            regex = r"\s+".join(re.escape(part) for part in needle.split())
+            for match in re.finditer(regex, self.text, re.IGNORECASE):
+                if any(start < match.end() and match.start() < end for start, end in covered):
+                    continue
+                covered.append(match.span())
+                spans.append((entity, match.start(), match.end()))
+
+        return spans
+
+    def span_rects(self, start, end):
+        """Rectangles covering text[start:end], one per line, skipping outer whitespace"""
+        rects = []
+        current_line = None
+        x0 = y0 = x1 = y1 = None
+
+        for offset in range(max(start, 0), min(end, len(self.text))):
+            box = self.glyphs.box(offset)
+            if box is None or self.text[offset].isspace():
+                continue
+
+            line = self.glyphs.lines[offset]
+            if line != current_line:
+                if current_line is not None:
+                    rects.append(fitz.Rect(x0, y0, x1, y1))
+                current_line = line
+                x0, y0, x1, y1 = box
+            else:
+                x0 = min(x0, box[0])
+                y0 = min(y0, box[1])
+                x1 = max(x1, box[2])
+                y1 = max(y1, box[3])
+
+        if current_line is not None:
+            rects.append(fitz.Rect(x0, y0, x1, y1))
+
+        return rects
+
+    def word_chars_in_range(self, word_index, x0, x1):
+        """Characters of a word whose glyph centre lies between x0 and x1"""
+        word_start, word_end = self.word_spans[word_index]
+        selected = []
+
+        for offset in range(word_start, word_end):
+            box = self.glyphs.box(offset)
+            if box is not None and x0 <= (box[0] + box[2]) / 2 <= x1:
+                selected.append(self.text[offset])
+
+        return "".join(selected)
+
+class PageTextCache:
+    """LRU cache of page text models keyed by document and page number"""
+
+    def __init__(self, max_pages=256):
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        DOCUMENT_CACHES.add(self)
+
+    @staticmethod
+    def document_key(doc):
+        """Identify a document by path and modification time, or by a token for in-memory files"""
+        name = getattr(doc, "name", "")
+        if name and os.path.isfile(name):
+            return (os.path.abspath(name), os.path.getmtime(name))
+
+        # id() is reused once a document is freed, so each in-memory document gets its own token
+        with FITZ_LOCK:
+            key = getattr(doc, "_redaaction_key", None)
+            if key is None:
+                key = ("<memory>", next(MEMORY_DOCUMENT_IDS))
+                doc._redaaction_key = key
+
+                # Nothing can hit the entries again after the document closes
+                close = doc.close
+                def close_and_forget():
+                    forget_document_key(key)
+                    return close()
+                doc.close = close_and_forget
+        return key
+
+    def forget_document_key(self, doc_key):
+        """Drop cached pages of the document with this key"""
+        with self._lock:
+            for key in [key for key in self._models if key[0] == doc_key]:
+                del self._models[key]
+
+    def get(self, page):
+        """Return the cached text model for a page, extracting it on first use"""
+        key = (self.document_key(page.parent), page.number)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+
+        model = PageTextModel(page)
+
+        with self._lock:
+            self.misses += 1
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_pages:
+                self._models.popitem(last=False)
+
+        return model
+
+    def invalidate(self, doc=None):
+        """Drop cached pages for one document, or everything"""
+        if doc is None:
+            with self._lock:
+                self._models.clear()
+            return
+
+        self.forget_document_key(self.document_key(doc))
+
+    def clear(self):
+        """Drop all cached pages"""
+        self.invalidate()
+
+def forget_document_key(doc_key):
+    """Drop everything any cache holds for a document key"""
+    for cache in list(DOCUMENT_CACHES):
+        cache.forget_document_key(doc_key)
+
+# Shared by preview, hit analysis, redaction and text selection
+PAGE_TEXT_CACHE = PageTextCache()
+
+class DocumentSession:
+    """An open PDF kept alive for as long as the file is being viewed"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.mtime = os.path.getmtime(self.path)
+        self.lock = threading.RLock()
+
+        with FITZ_LOCK:
+            self.doc = fitz.open(self.path)
+            # Page sizes are read once so the viewer never waits on background renders for them
+            self.page_rects = [page.rect for page in self.doc]
+
+    def __len__(self):
+        return len(self.doc)
+
+    def page(self, number):
+        """Load a page from the open document"""
+        return self.doc[number]
+
+    def is_stale(self):
+        """Check if the file changed on disk since it was opened"""
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return True
+
+    def close(self):
+        """Close the underlying document"""
+        try:
+            with FITZ_LOCK:
+                self.doc.close()
         except Exception as e:
-            print(f"Error in character-level boundaries: {e}")
-    
-        return precise_rects
+            print(f"Error closing {self.path}: {e}")
+
+class DocumentPool:
+    """Bounded LRU pool of open document sessions, keyed by file path"""
+
+    def __init__(self, max_open=4):
+        self.max_open = max_open
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Return the open session for a file, opening or reopening it when needed"""
+        key = os.path.abspath(path)
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.is_stale():
+                del self._sessions[key]
+                session.close()
+                session = None
+
+            if session is None:
+                session = DocumentSession(key)
+                self._sessions[key] = session
+
+            self._sessions.move_to_end(key)
+
+            while len(self._sessions) > self.max_open:
+                _, evicted = self._sessions.popitem(last=False)
+                evicted.close()
+
+            return session
+
+    def close(self, path):
+        """Close the session for one file"""
+        with self._lock:
+            session = self._sessions.pop(os.path.abspath(path), None)
+        if session is not None:
+            session.close()
+
+    def close_all(self):
+        """Close every open session"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+class PageRenderer:
+    """Renders PDF pages to PIL images"""
+
+    @staticmethod
+    def needs_tiles(rect, zoom):
+        """Check if a page is too large at a zoom to render in one piece"""
+        return rect.width * rect.height * zoom * zoom > TILED_RENDER_MIN_PIXELS
+
+    @staticmethod
+    def tile_clip(rect, zoom, column, row):
+        """Page area covered by a tile, in PDF points"""
+        x0 = rect.x0 + column * TILE_SIZE / zoom
+        y0 = rect.y0 + row * TILE_SIZE / zoom
+        return fitz.Rect(x0, y0,
+                         min(x0 + TILE_SIZE / zoom, rect.x1),
+                         min(y0 + TILE_SIZE / zoom, rect.y1))
+
+    @staticmethod
+    def render(page, zoom, clip=None):
+        """Render a page, or only the clip area of it, at the given zoom factor"""
+        mat = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
+
+        # Copy the pixmap memory straight into a PIL image, no encode/decode round trip
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples_mv,
+                               "raw", "RGB", pix.stride, 1)
+
+class RenderCache:
+    """LRU cache of rendered page images bounded by a memory budget"""
+
+    def __init__(self, max_mb=256):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.nbytes = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        DOCUMENT_CACHES.add(self)
+
+    @staticmethod
+    def make_key(doc, page_number, zoom):
+        """Cache key for a page of a document at a zoom level"""
+        # Zoom steps accumulate float error, so round before keying
+        return (PageTextCache.document_key(doc), page_number, round(zoom, 3))
+
+    @staticmethod
+    def make_tile_key(doc, page_number, zoom, column, row):
+        """Cache key for one tile of a page at a zoom level"""
+        return RenderCache.make_key(doc, page_number, zoom) + (column, row)
+
+    @staticmethod
+    def image_bytes(image):
+        """Approximate memory used by a decoded image"""
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        """Return a cached image or None"""
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def nearest(self, doc, page_number, zoom):
+        """Return the cached render of a page closest to a zoom, or None"""
+        doc_key = PageTextCache.document_key(doc)
+        best = None
+
+        with self._lock:
+            for key, image in self._images.items():
+                # Tiles only cover part of a page
+                if len(key) != 3:
+                    continue
+                key_doc, key_page, key_zoom = key
+                if key_doc != doc_key or key_page != page_number:
+                    continue
+                if best is None or abs(key_zoom - zoom) < abs(best[0] - zoom):
+                    best = (key_zoom, image)
+
+        return best[1] if best else None
+
+    def put(self, key, image):
+        """Store an image, evicting least recently used ones to stay within budget"""
+        size = self.image_bytes(image)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self.nbytes -= self.image_bytes(previous)
+
+            self._images[key] = image
+            self.nbytes += size
+            self._evict()
+
+    def set_budget(self, max_mb):
+        """Change the memory budget, evicting immediately if needed"""
+        with self._lock:
+            self.max_bytes = int(max_mb * 1024 * 1024)
+            self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._images:
+            _, evicted = self._images.popitem(last=False)
+            self.nbytes -= self.image_bytes(evicted)
+
+    def forget_document_key(self, doc_key):
+        """Drop cached images of the document with this key"""
+        with self._lock:
+            for key in [key for key in self._images if key[0] == doc_key]:
+                self.nbytes -= self.image_bytes(self._images.pop(key))
+
+    def clear(self):
+        """Drop all cached images"""
+        with self._lock:
+            self._images.clear()
+            self.nbytes = 0
+
+class HighlightLayer:
+    """Preview hits of one pattern on a page with a spatial index for hit testing"""
+
+    # Index cell size in PDF points
+    INDEX_CELL = 64
+
+    def __init__(self, label, color, matches, key=None):
+        self.label = label
+        self.color = color
+        self.key = key if key is not None else label
+        self.rects = []
+        self.texts = []
+        self._cells = {}
+
+        for match in matches:
+            x0, y0, x1, y1 = match['rect']
+            if x1 <= x0 or y1 <= y0:
+                continue
+
+            index = len(self.rects)
+            self.rects.append((x0, y0, x1, y1))
+            self.texts.append(match.get('text', ''))
+
+            for cell_x in range(int(x0 // self.INDEX_CELL), int(x1 // self.INDEX_CELL) + 1):
+                for cell_y in range(int(y0 // self.INDEX_CELL), int(y1 // self.INDEX_CELL) + 1):
+                    self._cells.setdefault((cell_x, cell_y), []).append(index)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def hit_test(self, x, y):
+        """Index of the hit containing a point in PDF coordinates, or None"""
+        cell = (int(x // self.INDEX_CELL), int(y // self.INDEX_CELL))
+        for index in self._cells.get(cell, ()):
+            x0, y0, x1, y1 = self.rects[index]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                return index
+        return None
+
+    def render(self, zoom, alpha=OVERLAY_ALPHA):
+        """Rasterize all hits into one translucent image, returned with its canvas offset"""
+        if not self.rects:
+            return None
+
+        # Pixel boxes with exclusive right and bottom edges
+        boxes = [(int(x0 * zoom), int(y0 * zoom), int(x1 * zoom) + 1, int(y1 * zoom) + 1)
+                 for x0, y0, x1, y1 in self.rects]
+        left = min(box[0] for box in boxes)
+        top = min(box[1] for box in boxes)
+        width = max(box[2] for box in boxes) - left
+        height = max(box[3] for box in boxes) - top
+
+        # Too large to hold as one bitmap, draw individual rectangles instead
+        if width * height > TILED_RENDER_MIN_PIXELS:
+            return None
+
+        color = ImageColor.getrgb(self.color)[:3]
+        image = Image.new("RGBA", (width, height), color + (0,))
+
+        if NUMPY_AVAILABLE:
+            corners = np.array(boxes, dtype=np.intp) - (left, top, left, top)
+            x0, y0, x1, y1 = corners.T
+            stride = width + 1
+
+            # 2D difference array: +1/-1 at box corners, prefix sums give coverage
+            cells = np.concatenate([y0 * stride + x0, y0 * stride + x1,
+                                    y1 * stride + x0, y1 * stride + x1])
+            signs = np.repeat(np.array([1, -1, -1, 1], dtype=np.int32), len(boxes))
+            coverage = np.bincount(cells, weights=signs, minlength=(height + 1) * stride)
+            coverage = coverage.astype(np.int32).reshape(height + 1, stride)
+            covered = coverage.cumsum(axis=0).cumsum(axis=1)[:height, :width] > 0
+
+            image.putalpha(Image.fromarray(covered.astype(np.uint8) * alpha, "L"))
+        else:
+            draw = ImageDraw.Draw(image)
+            for x0, y0, x1, y1 in boxes:
+                draw.rectangle([x0 - left, y0 - top, x1 - left - 1, y1 - top - 1],
+                               fill=color + (alpha,))
+
+        return left, top, image
+
+class UltraPrecisionRedactor:
+    """Ultra-precise redaction engine with perfect boundary detection"""
+
+    # Glyph boxes are exact, so only a hairline of padding is needed
+    REDACTION_PADDING = 0.5
+
+    # Boxes spanning more grid cells than this are compared against all boxes when merging
+    MERGE_MAX_CELLS = 64
     
     @staticmethod
-    def apply_ultra_precise_redaction(page, matches):
-        """Apply redaction with ultra-precise boundaries"""
-        redaction_count = 0
-        
+    def find_ultra_precise_matches(page, regex_pattern):
+        """Ultra-precise text matching using word-level data - FIXED SYNTAX"""
+        hits = UltraPrecisionRedactor.find_pattern_set_matches(
+            page, PatternSet([{"label": regex_pattern, "regex": regex_pattern}])
+        )
+        return hits.get(0, [])
+
+    @staticmethod
+    def find_pattern_set_matches(page, pattern_set):
+        """Match every pattern of a PatternSet in one pass, keyed by pattern index"""
+        hits = {}
+
+        try:
+            # Word-level data for precise boundaries, extracted once per page
+            page_model = PAGE_TEXT_CACHE.get(page)
+
+            for index, regex_match in pattern_set.finditer(page_model.text):
+                hits.setdefault(index, []).extend(
+                    UltraPrecisionRedactor.resolve_match(page_model, regex_match)
+                )
+
+        except Exception as e:
+            print(f"Error in ultra-precise matching: {e}")
+
+        return hits
+
+    @staticmethod
+    def find_pattern_set_boxes(page, pattern_set):
+        """Page text and hits of every pattern as flat (x0, y0, x1, y1, start, end, ...) arrays"""
+        boxes = {}
+        text = ""
+
+        try:
+            page_model = PAGE_TEXT_CACHE.get(page)
+            text = page_model.text
+
+            for index, regex_match in pattern_set.finditer(text):
+                start, end = regex_match.span()
+                if not text[start:end].strip():
+                    continue
+                records = boxes.setdefault(index, array("d"))
+                for rect in page_model.span_rects(start, end):
+                    records.extend((rect.x0, rect.y0, rect.x1, rect.y1, start, end))
+
+        except Exception as e:
+            print(f"Error in ultra-precise matching: {e}")
+
+        return text, boxes
+
+    @staticmethod
+    def resolve_match(page_model, regex_match):
+        """Turn a regex match on the page text into rectangles for that occurrence only"""
+        matches = []
+        matched_text = regex_match.group().strip()
+
+        if matched_text:
+            # Offsets map straight to glyph boxes, O(match length)
+            for rect in page_model.span_rects(regex_match.start(), regex_match.end()):
+                matches.append({
+                    'rect': rect,
+                    'text': matched_text,
+                    'span': regex_match.span()
+                })
+
+        return matches
+
+    @staticmethod
+    def merge_boxes(boxes):
+        """Merge overlapping boxes until no two intersect, returns (x0, y0, x1, y1) tuples"""
+        boxes = [tuple(box) for box in boxes]
+        if len(boxes) < 2:
+            return boxes
+
+        if NUMPY_AVAILABLE:
+            merged = np.asarray(boxes, dtype=np.float64)
+            while True:
+                count = len(merged)
+                merged = UltraPrecisionRedactor._merge_rows(merged)
+                merged = UltraPrecisionRedactor._merge_components(merged)
+                if len(merged) == count:
+                    break
+            return [tuple(box) for box in merged.tolist()]
+
+        while True:
+            count = len(boxes)
+            boxes = UltraPrecisionRedactor._merge_sweep(boxes)
+            if len(boxes) == count:
+                return boxes
+
+    @staticmethod
+    def _merge_rows(boxes):
+        """Vectorized merge of overlapping boxes that share the same text row"""
+        order = np.lexsort((boxes[:, 0], boxes[:, 3], boxes[:, 1]))
+        boxes = boxes[order]
+
+        # Rows are runs of identical y extents, as produced by glyph boxes on one line
+        new_row = np.ones(len(boxes), dtype=bool)
+        new_row[1:] = (boxes[1:, 1] != boxes[:-1, 1]) | (boxes[1:, 3] != boxes[:-1, 3])
+        row_id = np.cumsum(new_row) - 1
+
+        # Shift each row along x so the running maximum never leaks across rows
+        width = boxes[:, 2].max() - boxes[:, 0].min() + 1.0
+        shift = row_id * width - boxes[:, 0].min()
+        x0 = boxes[:, 0] + shift
+        x1 = boxes[:, 2] + shift
+        reach = np.maximum.accumulate(x1)
+
+        starts = np.ones(len(boxes), dtype=bool)
+        starts[1:] = new_row[1:] | (x0[1:] >= reach[:-1])
+        starts = np.flatnonzero(starts)
+
+        return np.column_stack((
+            np.minimum.reduceat(boxes[:, 0], starts),
+            np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts),
+            np.maximum.reduceat(boxes[:, 3], starts),
+        ))
+
+    @staticmethod
+    def _merge_components(boxes):
+        """Vectorized merge of each group of boxes connected through overlaps"""
+        count = len(boxes)
+        widths = boxes[:, 2] - boxes[:, 0]
+        heights = boxes[:, 3] - boxes[:, 1]
+
+        # Grid cells about the size of a typical box, so each cell holds only a few
+        cell_w = max(float(np.percentile(widths, 90)), 1e-3)
+        cell_h = max(float(np.percentile(heights, 90)), 1e-3)
+        left = boxes[:, 0].min()
+        top = boxes[:, 1].min()
+        col0 = ((boxes[:, 0] - left) // cell_w).astype(np.int64)
+        col1 = ((boxes[:, 2] - left) // cell_w).astype(np.int64)
+        row0 = ((boxes[:, 1] - top) // cell_h).astype(np.int64)
+        row1 = ((boxes[:, 3] - top) // cell_h).astype(np.int64)
+        cols = int(col1.max()) + 1
+
+        # One entry per (box, cell) it touches, boxes covering many cells are checked directly
+        span_cols = col1 - col0 + 1
+        cells = span_cols * (row1 - row0 + 1)
+        large = np.flatnonzero(cells > UltraPrecisionRedactor.MERGE_MAX_CELLS)
+        cells[large] = 0
+        owner = np.repeat(np.arange(count), cells)
+        offset = np.arange(len(owner)) - np.repeat(np.cumsum(cells) - cells, cells)
+        cell = ((row0[owner] + offset // span_cols[owner]) * cols +
+                col0[owner] + offset % span_cols[owner])
+
+        # Within a cell, a box can only overlap the boxes after it that start before it ends
+        width = boxes[:, 2].max() - left + 1.0
+        keys = cell * width + (boxes[owner, 0] - left)
+        order = np.argsort(keys, kind="stable")
+        owner = owner[order]
+        keys = keys[order]
+        ends = np.searchsorted(keys, cell[order] * width + (boxes[owner, 2] - left), side="left")
+
+        reach = np.maximum(ends - np.arange(len(owner)) - 1, 0)
+        first = np.repeat(np.arange(len(owner)), reach)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(reach) - reach, reach)
+        first = [owner[first]]
+        second = [owner[second]]
+
+        for index in large:
+            hits = np.flatnonzero((boxes[:, 0] < boxes[index, 2]) & (boxes[index, 0] < boxes[:, 2]) &
+                                  (boxes[:, 1] < boxes[index, 3]) & (boxes[index, 1] < boxes[:, 3]))
+            first.append(np.full(len(hits), index))
+            second.append(hits)
+
+        first = np.concatenate(first)
+        second = np.concatenate(second)
+
+        overlap = ((first != second) &
+                   (boxes[second, 1] < boxes[first, 3]) & (boxes[first, 1] < boxes[second, 3]) &
+                   (boxes[second, 0] < boxes[first, 2]) & (boxes[first, 0] < boxes[second, 2]))
+        first = first[overlap]
+        second = second[overlap]
+
+        if not len(first):
+            return boxes
+
+        # Hook the root of each group onto the lowest root it touches, then flatten the trees
+        labels = np.arange(count)
+        while True:
+            low = labels[first]
+            high = labels[second]
+            if np.array_equal(low, high):
+                break
+            updated = labels.copy()
+            np.minimum.at(updated, np.maximum(low, high), np.minimum(low, high))
+            while True:
+                flattened = updated[updated]
+                if np.array_equal(flattened, updated):
+                    break
+                updated = flattened
+            labels = updated
+
+        order = np.argsort(labels, kind="stable")
+        boxes = boxes[order]
+        labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+
+        return np.column_stack((
+            np.minimum.reduceat(boxes[:, 0], starts),
+            np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts),
+            np.maximum.reduceat(boxes[:, 3], starts),
+        ))
+
+    @staticmethod
+    def _merge_sweep(boxes):
+        """Single sweep along y that merges each box with every active box it overlaps"""
+        active = []
+        done = []
+
+        for box in sorted(boxes, key=lambda b: b[1]):
+            x0, y0, x1, y1 = box
+
+            # Boxes ending above this one can never overlap it or anything after it
+            still_active = []
+            for other in active:
+                if other[3] <= y0:
+                    done.append(other)
+                elif other[0] < x1 and x0 < other[2] and other[1] < y1:
+                    x0 = min(x0, other[0])
+                    y0 = min(y0, other[1])
+                    x1 = max(x1, other[2])
+                    y1 = max(y1, other[3])
+                else:
+                    still_active.append(other)
+
+            still_active.append((x0, y0, x1, y1))
+            active = still_active
+
+        return done + active
+
+    @staticmethod
+    def apply_ultra_precise_redaction(page, matches):
+        """Apply redaction with ultra-precise boundaries"""
+        plan = RedactionPlan(page.number)
+        plan.add_matches(matches, "matches")
+        return plan.commit(page)
+
+class RedactionPlan:
+    """Redaction boxes for one page, collected from every source and committed once"""
+
+    def __init__(self, page_number):
+        self.page_number = page_number
+        self.entries = []
+        self.merged = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, rect, label, source="pattern", text=""):
+        """Queue one rectangle, ignoring degenerate boxes"""
+        x0, y0, x1, y1 = tuple(rect)
+        if x1 - x0 > 0.1 and y1 - y0 > 0.1:
+            self.entries.append({
+                "rect": (x0, y0, x1, y1),
+                "label": label,
+                "source": source,
+                "text": text
+            })
+            self.merged = None
+
+    def add_matches(self, matches, label, source="pattern"):
+        """Queue rectangle matches from UltraPrecisionRedactor"""
+        for match in matches:
+            self.add(match['rect'], label, source, match.get('text', ""))
+
+    def merge(self, padding=None):
+        """Pad and merge all queued boxes once, returns the boxes to redact"""
+        if padding is None:
+            padding = UltraPrecisionRedactor.REDACTION_PADDING
+
+        if self.merged is None:
+            padded = [(x0 - padding, y0 - padding, x1 + padding, y1 + padding)
+                      for x0, y0, x1, y1 in (entry["rect"] for entry in self.entries)]
+            self.merged = UltraPrecisionRedactor.merge_boxes(padded)
+
+        return self.merged
+
+    def commit(self, page):
+        """Add every merged box and rewrite the page content in one apply_redactions pass"""
+        if not self.entries:
+            return 0
+
+        for box in self.merge():
+            try:
+                page.add_redact_annot(fitz.Rect(box), fill=(0, 0, 0))
+            except Exception as e:
+                print(f"Error applying redaction: {e}")
+                continue
+
+        page.apply_redactions()
+        return len(self.entries)
+
+    def to_dict(self, include_text=False):
+        """Serializable form of the plan, including the merged boxes"""
+        # Matched text is the sensitive content itself, so it is only written on request
+        entries = [dict(entry, rect=list(entry["rect"])) for entry in self.entries]
+        if not include_text:
+            for entry in entries:
+                entry.pop("text", None)
+
+        return {
+            "page": self.page_number,
+            "entries": entries,
+            "merged": [list(box) for box in self.merge()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a plan saved with to_dict"""
+        plan = cls(data["page"])
+        for entry in data.get("entries", []):
+            plan.add(entry["rect"], entry.get("label", ""), entry.get("source", "pattern"),
+                     entry.get("text", ""))
+        return plan
+
+class HitIndex:
+    """Pattern hits per document page, computed once per pattern and reused"""
+
+    # Hits are kept as rows of (x0, y0, x1, y1, start, end) in flat arrays
+    RECORD_SIZE = 6
+
+    # Rough per-entry overhead of the dicts and arrays holding the hits
+    ENTRY_BYTES = 128
+
+    def __init__(self, max_mb=HIT_INDEX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.nbytes = 0
+        self.scans = 0
+        self.evictions = 0
+        self._epoch = 0
+        self._pages = OrderedDict()
+        self._texts = {}
+        self._pattern_sets = OrderedDict()
+        self._lock = threading.Lock()
+        DOCUMENT_CACHES.add(self)
+
+    @classmethod
+    def records_bytes(cls, records):
+        """Approximate memory held by the hits of one pattern on one page"""
+        return cls.ENTRY_BYTES + len(records) * records.itemsize
+
+    def _page_bytes(self, key):
+        return (self.ENTRY_BYTES + len(self._texts.get(key, "")) +
+                sum(self.records_bytes(records) for records in self._pages[key].values()))
+
+    def _drop_page(self, key):
+        self.nbytes -= self._page_bytes(key)
+        del self._pages[key]
+        self._texts.pop(key, None)
+
+    def _pattern_set(self, patterns):
+        """Compiled PatternSet for a list of patterns, reused across pages"""
+        key = tuple(pattern["regex"] for pattern in patterns)
+
+        with self._lock:
+            pattern_set = self._pattern_sets.get(key)
+            if pattern_set is not None:
+                self._pattern_sets.move_to_end(key)
+                return pattern_set
+
+        pattern_set = PatternSet(patterns)
+
+        with self._lock:
+            self._pattern_sets[key] = pattern_set
+            while len(self._pattern_sets) > 32:
+                self._pattern_sets.popitem(last=False)
+
+        return pattern_set
+
+    def cached_regexes(self, page):
+        """Regexes whose hits are already known for a page"""
+        key = (PageTextCache.document_key(page.parent), page.number)
+        with self._lock:
+            return set(self._pages.get(key, {}))
+
+    def index_page(self, page, patterns):
+        """Make sure a page has hits for all patterns, scanning only the ones not seen yet"""
+        key = (PageTextCache.document_key(page.parent), page.number)
+
+        with self._lock:
+            known = dict(self._pages.get(key, {}))
+            text = self._texts.get(key, "")
+            if key in self._pages:
+                self._pages.move_to_end(key)
+            epoch = self._epoch
+
+        missing = [pattern for pattern in
+                   {pattern["regex"]: pattern for pattern in patterns}.values()
+                   if pattern["regex"] not in known]
+
+        if missing:
+            with FITZ_LOCK:
+                text, found = UltraPrecisionRedactor.find_pattern_set_boxes(
+                    page, self._pattern_set(missing))
+
+            for index, pattern in enumerate(missing):
+                known[pattern["regex"]] = found.get(index, array("d"))
+
+            with self._lock:
+                self.scans += 1
+
+                # Hits scanned before an invalidation must not bring forgotten patterns back
+                if epoch != self._epoch:
+                    return text, known
+
+                if key in self._pages:
+                    self._drop_page(key)
+                self._pages[key] = known
+                self._texts[key] = text
+                self.nbytes += self._page_bytes(key)
+
+                while self.nbytes > self.max_bytes and len(self._pages) > 1:
+                    self._drop_page(next(iter(self._pages)))
+                    self.evictions += 1
+
+        return text, known
+
+    def get_page_hits(self, page, patterns):
+        """Hits keyed by pattern index, scanning only patterns not seen on this page yet"""
+        text, known = self.index_page(page, patterns)
+        size = self.RECORD_SIZE
+
+        hits = {}
+        resolved = {}
+        for index, pattern in enumerate(patterns):
+            regex = pattern["regex"]
+            if regex not in resolved:
+                records = known.get(regex, ())
+                matches = []
+                for row in range(0, len(records), size):
+                    x0, y0, x1, y1, start, end = records[row:row + size]
+                    start = int(start)
+                    end = int(end)
+                    matches.append({
+                        'rect': fitz.Rect(x0, y0, x1, y1),
+                        'text': text[start:end].strip(),
+                        'span': (start, end)
+                    })
+                resolved[regex] = matches
+            hits[index] = resolved[regex]
+
+        return hits
+
+    def covers(self, doc, page_count, patterns):
+        """Check if every page of a document has hits for all patterns"""
+        doc_key = PageTextCache.document_key(doc)
+        regexes = {pattern["regex"] for pattern in patterns}
+
+        with self._lock:
+            for page_number in range(page_count):
+                entry = self._pages.get((doc_key, page_number))
+                if entry is None or not regexes.issubset(entry):
+                    return False
+        return True
+
+    def index_document(self, session, patterns, should_continue=None, progress_callback=None):
+        """Fill the index for every page of a document, returns False if stopped early"""
+        total_pages = len(session)
+        evictions = self.evictions
+
+        for page_number in range(total_pages):
+            if should_continue and not should_continue():
+                return False
+
+            # A document larger than the budget would only evict its own first pages
+            if self.evictions != evictions:
+                return False
+
+            with FITZ_LOCK:
+                if session.doc.is_closed:
+                    return False
+                page = session.page(page_number)
+
+            self.index_page(page, patterns)
+
+            if progress_callback:
+                progress_callback(page_number + 1, total_pages)
+
+        return True
+
+    def invalidate_pattern(self, regex):
+        """Forget the hits of one pattern on every page"""
+        with self._lock:
+            self._epoch += 1
+            for entry in self._pages.values():
+                records = entry.pop(regex, None)
+                if records is not None:
+                    self.nbytes -= self.records_bytes(records)
+            for key in [key for key in self._pattern_sets if regex in key]:
+                del self._pattern_sets[key]
+
+    def invalidate_document(self, doc):
+        """Forget all hits of a document"""
+        self.forget_document_key(PageTextCache.document_key(doc))
+
+    def forget_document_key(self, doc_key):
+        """Forget all hits of the document with this key"""
+        with self._lock:
+            self._epoch += 1
+            for key in [key for key in self._pages if key[0] == doc_key]:
+                self._drop_page(key)
+
+    def clear(self):
+        """Forget all hits"""
+        with self._lock:
+            self._epoch += 1
+            self._pages.clear()
+            self._texts.clear()
+            self._pattern_sets.clear()
+            self.nbytes = 0
+
+class BackgroundRenderer:
+    """Worker thread that renders neighbouring pages and precomputes their hits"""
+
+    def __init__(self, render_cache, hit_index):
+        self.render_cache = render_cache
+        self.hit_index = hit_index
+        self._jobs = queue.Queue()
+        self._generation = 0
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def prefetch(self, session, page_numbers, zoom, patterns=None):
+        """Queue pages for rendering at a zoom, superseding older prefetch requests"""
+        self._generation += 1
+        generation = self._generation
+        patterns = list(patterns or [])
+
+        for page_number in page_numbers:
+            self._jobs.put((generation, session, page_number, zoom, patterns))
+
+        self._ensure_started()
+
+    def cancel(self):
+        """Drop all queued work"""
+        self._generation += 1
+
+    def stop(self):
+        """Stop the worker thread"""
+        self.cancel()
+        self._jobs.put(None)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+
+            generation, session, page_number, zoom, patterns = job
+            if generation != self._generation:
+                continue
+
+            try:
+                with FITZ_LOCK:
+                    if session.doc.is_closed:
+                        continue
+                    page = session.page(page_number)
+
+                    key = RenderCache.make_key(session.doc, page_number, zoom)
+                    if PageRenderer.needs_tiles(page.rect, zoom):
+                        pass
+                    elif self.render_cache.get(key) is None:
+                        self.render_cache.put(key, PageRenderer.render(page, zoom))
+
+                    if patterns:
+                        self.hit_index.index_page(page, patterns)
+
+            except Exception as e:
+                print(f"Error prefetching page {page_number + 1}: {e}")
+
+class ProgressiveRenderer:
+    """Worker thread that renders only the most recently requested page and zoom"""
+
+    def __init__(self, render_cache):
+        self.render_cache = render_cache
+        self._pending = None
+        self._generation = 0
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def request(self, session, page_number, zoom, callback):
+        """Render a page in the background, replacing any request not started yet"""
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, session, page_number, zoom, callback)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._running = True
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+            self._condition.notify()
+
+    def cancel(self):
+        """Drop the pending request and discard any render in progress"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        """Stop the worker thread"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._running = False
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                generation, session, page_number, zoom, callback = self._pending
+                self._pending = None
+
+            try:
+                with FITZ_LOCK:
+                    if session.doc.is_closed:
+                        continue
+                    key = RenderCache.make_key(session.doc, page_number, zoom)
+                    image = self.render_cache.get(key)
+                    if image is None:
+                        image = PageRenderer.render(session.page(page_number), zoom)
+                        self.render_cache.put(key, image)
+
+                # A newer request arrived while rendering, so this result is stale
+                if generation == self._generation:
+                    callback(image)
+
+            except Exception as e:
+                print(f"Error rendering page {page_number + 1}: {e}")
+
+class PreviewPipeline:
+    """Collects preview hits for a page from every source, dedupes them and groups them for drawing"""
+
+    SOURCES = ("regex", "selection", "pii")
+
+    def __init__(self, hit_index, pii_detector=None):
+        self.hit_index = hit_index
+        self.pii_detector = pii_detector
+        # Text scans per (source, page number), for benchmarks
+        self.scans = {}
+
+    @staticmethod
+    def pattern_source(pattern):
+        """Source a pattern belongs to"""
+        return "selection" if pattern.get("type") == "selection" else "regex"
+
+    def _record_scans(self, source, page, count):
+        key = (source, page.number)
+        self.scans[key] = self.scans.get(key, 0) + count
+
+    def collect(self, page, patterns, use_pii=False, pii_types=None, pii_threshold=0.35,
+                entity_color=None):
+        """All hits on a page as dicts with rect, text, label, color and source"""
+        hits = []
+
+        for source in ("regex", "selection"):
+            source_patterns = [pattern for pattern in patterns
+                               if self.pattern_source(pattern) == source]
+            if not source_patterns:
+                continue
+
+            scans_before = self.hit_index.scans
+            page_hits = self.hit_index.get_page_hits(page, source_patterns)
+            self._record_scans(source, page, self.hit_index.scans - scans_before)
+
+            for index, pattern in enumerate(source_patterns):
+                for match in page_hits.get(index, []):
+                    hits.append({
+                        'rect': match['rect'],
+                        'text': match['text'],
+                        'label': pattern["label"],
+                        'color': pattern["color"],
+                        'source': source
+                    })
+
+        if use_pii and self.pii_detector is not None:
+            try:
+                with FITZ_LOCK:
+                    page_model = PAGE_TEXT_CACHE.get(page)
+
+                if page_model.text.strip():
+                    entities = self.pii_detector.detect_entities_batch([page_model.text], pii_types)[0]
+                    self._record_scans("pii", page, 1)
+
+                    # Entity offsets index the same text as the glyph index
+                    entities = [entity for entity in entities if entity["score"] >= pii_threshold]
+                    for entity, start, end in page_model.entity_spans(entities):
+                        color = entity_color(entity["entity"]) if entity_color else "#000000"
+                        for rect in page_model.span_rects(start, end):
+                            hits.append({
+                                'rect': rect,
+                                'text': entity.get("text", ""),
+                                'label': entity["entity"],
+                                'color': color,
+                                'source': "pii"
+                            })
+
+            except Exception as e:
+                print(f"Error in PII detection on page {page.number + 1}: {e}")
+
+        return self.dedupe(hits)
+
+    @staticmethod
+    def layer_key(hit):
+        """Layer a hit is drawn in, one per pattern and one per PII entity type"""
+        return ("pii" if hit['source'] == "pii" else "pattern", hit['label'])
+
+    @staticmethod
+    def dedupe(hits):
+        """Drop hits covering the same box as an earlier hit of the same layer"""
+        seen = set()
+        unique = []
+
+        for hit in hits:
+            key = (PreviewPipeline.layer_key(hit),) + tuple(round(value, 1) for value in hit['rect'])
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(hit)
+
+        return unique
+
+    @staticmethod
+    def layers(hits):
+        """Group hits into one HighlightLayer per layer key, in first-seen order"""
+        grouped = OrderedDict()
+        for hit in hits:
+            grouped.setdefault(PreviewPipeline.layer_key(hit), []).append(hit)
+
+        return [HighlightLayer(group[0]['label'], group[0]['color'], group, key=key)
+                for key, group in grouped.items()]
+
+class PreviewScheduler:
+    """Debounces preview requests and runs only the latest one on a worker thread"""
+
+    def __init__(self, window, delay_ms=PREVIEW_DEBOUNCE_MS):
+        self.window = window
+        self.delay_ms = delay_ms
+        self._after_id = None
+        self._pending = None
+        self._busy = False
+        self._generation = 0
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, make_task, on_done, delay_ms=None):
+        """After a quiet period call make_task() on the Tk thread, run the task it
+        returns on the worker and pass the result to on_done() on the Tk thread"""
+        self.cancel()
+        delay = self.delay_ms if delay_ms is None else delay_ms
+        self._after_id = self.window.after(delay, lambda: self._submit(make_task, on_done))
+
+    def pending(self):
+        """Check if a preview is waiting or running"""
+        return self._after_id is not None or self._pending is not None or self._busy
+
+    def cancel(self):
+        """Drop the waiting request and discard the result of a running one"""
+        if self._after_id is not None:
+            try:
+                self.window.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        """Stop the worker thread"""
+        self.cancel()
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def _submit(self, make_task, on_done):
+        self._after_id = None
+
+        # The task captures application state now, so it always reflects the latest request
+        task = make_task()
+        if task is None:
+            return
+
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, task, on_done)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._running = True
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                generation, task, on_done = self._pending
+                self._pending = None
+                self._busy = True
+
+            try:
+                result = task()
+            except Exception as e:
+                result = e
+
+            self._busy = False
+
+            # Superseded while running, a newer result will be drawn instead
+            if generation == self._generation:
+                self.window.after(0, lambda: self._deliver(generation, on_done, result))
+
+    def _deliver(self, generation, on_done, result):
+        if generation == self._generation:
+            on_done(result)
+
+class RedactionEngine:
+    """GUI-free redaction pipeline for headless and batch processing"""
+
+    def __init__(self, patterns=None, pii_detector=None, use_pii_detection=False,
+                 pii_types=None, pii_threshold=0.35, hit_index=None):
+        self.patterns = self.normalize_patterns(patterns or [])
+        self.pii_detector = pii_detector
+        self.use_pii_detection = use_pii_detection
+        self.pii_types = list(pii_types) if pii_types else None
+        self.pii_threshold = pii_threshold
+        self.hit_index = hit_index
+        self.redactor = UltraPrecisionRedactor()
+        self.pattern_set = PatternSet(self.patterns)
+
+    def find_page_hits(self, page):
+        """Pattern hits on a page keyed by pattern index, from the hit index when there is one"""
+        if self.hit_index is not None:
+            return self.hit_index.get_page_hits(page, self.patterns)
+        return self.redactor.find_pattern_set_matches(page, self.pattern_set)
+
+    @staticmethod
+    def preset_name(name):
+        """Preset name matching a string apart from case and whitespace, or None"""
+        wanted = " ".join(name.split()).lower()
+        for preset in PREDEFINED_PATTERNS:
+            if " ".join(preset.split()).lower() == wanted:
+                return preset
+        return None
+
+    @staticmethod
+    def normalize_patterns(patterns):
+        """Accept pattern dicts, preset names or raw regex strings"""
+        normalized = []
+
+        for pattern in patterns:
+            if isinstance(pattern, dict):
+                if "regex" not in pattern:
+                    raise ValueError(f"Pattern has no regex: {pattern}")
+                normalized.append({
+                    "label": pattern.get("label", pattern["regex"]),
+                    "regex": pattern["regex"],
+                    "color": pattern.get("color", "#000000"),
+                    "type": pattern.get("type", "custom")
+                })
+            elif pattern in PREDEFINED_PATTERNS:
+                normalized.append({
+                    "label": pattern,
+                    "regex": PREDEFINED_PATTERNS[pattern],
+                    "color": "#000000",
+                    "type": "preset"
+                })
+            elif RedactionEngine.preset_name(pattern):
+                name = RedactionEngine.preset_name(pattern)
+                normalized.append({
+                    "label": name,
+                    "regex": PREDEFINED_PATTERNS[name],
+                    "color": "#000000",
+                    "type": "preset"
+                })
+            else:
+                # A misspelled preset runs as a literal and likely matches nothing, so say so
+                import difflib
+                close = difflib.get_close_matches(pattern.lower(),
+                                                  [name.lower() for name in PREDEFINED_PATTERNS],
+                                                  n=1, cutoff=0.75)
+                if close and not re.search(r"[\\^$.|?*+\[\]{}]", pattern):
+                    print(f"Warning: '{pattern}' is not a preset and is matched literally - did you "
+                          f"mean '{RedactionEngine.preset_name(close[0])}'?", file=sys.stderr)
+
+                normalized.append({
+                    "label": pattern,
+                    "regex": pattern,
+                    "color": "#000000",
+                    "type": "custom"
+                })
+
+        # Reject invalid regexes up front instead of once per page
+        for pattern in normalized:
+            try:
+                re.compile(pattern["regex"])
+            except re.error as regex_error:
+                raise ValueError(f"Invalid regex in pattern {pattern['label']}: {regex_error}")
+
+        return normalized
+
+    def pii_ready(self):
+        """Check if PII detection can run without user interaction"""
+        if not self.use_pii_detection or self.pii_detector is None:
+            return False
+        if not self.pii_detector.is_available():
+            return False
+        if not self.pii_detector.ensure_initialized():
+            return False
+        return self.pii_detector.current_model is not None
+
+    def detect_page_entities(self, page_models):
+        """PII entities above the threshold for several pages in one batched model call"""
+        texts = [page_model.text for page_model in page_models]
+        batches = self.pii_detector.detect_entities_batch(texts, self.pii_types)
+        return [[ent for ent in entities if ent["score"] >= self.pii_threshold]
+                for entities in batches]
+
+    def _block_entities(self, doc, page_numbers, use_pii):
+        """Batched PII entities for a block of pages, keyed by page number"""
+        if not use_pii:
+            return {}
+
         try:
-            # First collect all redactions
-            redactions = []
-            for match in matches:
-                try:
-                    precise_rect = match['rect']
-                    
-                    # Validate and adjust rectangle if needed
-                    if precise_rect.width > 0.1 and precise_rect.height > 0.1:
-                        # Add some padding around the text
-                        padding = 2
-                        precise_rect.x0 -= padding
-                        precise_rect.x1 += padding
-                        precise_rect.y0 -= padding
-                        precise_rect.y1 += padding
-                        
-                        redactions.append(precise_rect)
-                        redaction_count += 1
-                except Exception as e:
-                    print(f"Error processing redaction: {e}")
-                    continue
-            
-            # Merge overlapping redactions
-            merged_redactions = []
-            for rect in sorted(redactions, key=lambda r: (r.y0, r.x0)):
-                merged = False
-                for merged_rect in merged_redactions:
-                    if merged_rect.intersects(rect):
-                        merged_rect.include_rect(rect)
-                        merged = True
-                        break
-                if not merged:
-                    merged_redactions.append(rect)
-            
-            # Apply merged redactions
-            for rect in merged_redactions:
-                try:
-                    # Add redaction annotation
-                    annot = page.add_redact_annot(rect)
-                    
-                    # Set properties for better visibility
-                    annot.set_fill_color((0, 0, 0))  # Black fill
-                    annot.set_border_color((1, 0, 0))  # Red border
-                    annot.set_border_width(0)  # No border
-                    annot.update()
-                    
-                except Exception as e:
-                    print(f"Error applying redaction: {e}")
-                    continue
-                    
-            # Apply all redactions at once
-            page.apply_redactions()
-            
+            # MuPDF is shared with the viewer's background threads, the model call is not
+            with FITZ_LOCK:
+                page_models = [PAGE_TEXT_CACHE.get(doc[page_num]) for page_num in page_numbers]
+            return dict(zip(page_numbers, self.detect_page_entities(page_models)))
         except Exception as e:
-            print(f"Error in redaction process: {e}")
-            
-        return redaction_count
+            print(f"Error in batched PII detection: {e}")
+            return {}
+
+    def plan_page(self, page, use_pii=None, entities=None):
+        """Collect pattern and PII boxes for a page without modifying it"""
+        if use_pii is None:
+            use_pii = self.pii_ready()
+
+        plan = RedactionPlan(page.number)
+        with FITZ_LOCK:
+            page_model = PAGE_TEXT_CACHE.get(page)
+            page_hits = self.find_page_hits(page)
+
+        for index, pattern in enumerate(self.patterns):
+            plan.add_matches(page_hits.get(index, []), pattern["label"])
+
+        if use_pii:
+            try:
+                # Entities may come precomputed from a batch over several pages
+                if entities is None:
+                    entities = self.detect_page_entities([page_model])[0]
+
+                # Entity offsets index the same text as the glyph index
+                for entity, start, end in page_model.entity_spans(entities):
+                    for rect in page_model.span_rects(start, end):
+                        plan.add(rect, entity["entity"], "pii", entity.get("text", ""))
+
+            except Exception as e:
+                print(f"Error in PII detection on page {page.number + 1}: {e}")
+
+        return plan
+
+    def redact_page(self, page, use_pii=None, entities=None):
+        """Redact all pattern and PII matches on a single page in one pass"""
+        plan = self.plan_page(page, use_pii, entities)
+        with FITZ_LOCK:
+            return plan.commit(page)
+
+    def plan_document(self, input_path, progress_callback=None):
+        """Build redaction plans for every page of a document without committing them"""
+        use_pii = self.pii_ready()
+        plans = []
+
+        with FITZ_LOCK:
+            doc = fitz.open(input_path)
+        try:
+            total_pages = len(doc)
+
+            for block_start in range(0, total_pages, PII_BATCH_PAGES):
+                block = range(block_start, min(block_start + PII_BATCH_PAGES, total_pages))
+                block_entities = self._block_entities(doc, block, use_pii)
+
+                for page_num in block:
+                    if progress_callback:
+                        progress_callback((page_num / max(total_pages, 1)) * 100,
+                                          f"Planning page {page_num + 1} of {total_pages}")
+
+                    with FITZ_LOCK:
+                        page = doc[page_num]
+                    plans.append(self.plan_page(page, use_pii=use_pii,
+                                                entities=block_entities.get(page_num)))
+        finally:
+            with FITZ_LOCK:
+                doc.close()
+
+        return plans
+
+    def analyze_document(self, source, progress_callback=None):
+        """Count pattern hits per page without modifying the document"""
+        hit_details = {}
+        total_hits = 0
+
+        # Accept an already open document so viewers can reuse their handle
+        owns_doc = isinstance(source, str)
+        doc = fitz.open(source) if owns_doc else source
+        try:
+            total_pages = len(doc)
+
+            for page_num in range(total_pages):
+                # The document may be shared with background indexing
+                with FITZ_LOCK:
+                    page = doc[page_num]
+
+                if progress_callback:
+                    progress_callback((page_num / max(total_pages, 1)) * 100,
+                                      f"Analyzing page {page_num + 1} of {total_pages}")
+
+                page_matches = self.find_page_hits(page)
+
+                for index, pattern in enumerate(self.patterns):
+                    pattern_label = pattern["label"]
+
+                    if pattern_label not in hit_details:
+                        hit_details[pattern_label] = {"total": 0, "pages": []}
+
+                    try:
+                        page_hits = len(page_matches.get(index, []))
+
+                        if page_hits > 0:
+                            hit_details[pattern_label]["total"] += page_hits
+                            hit_details[pattern_label]["pages"].append({
+                                "page": page_num + 1,
+                                "hits": page_hits
+                            })
+                            total_hits += page_hits
+
+                    except Exception as e:
+                        print(f"Error analyzing pattern {pattern_label} on page {page_num + 1}: {e}")
+                        continue
+        finally:
+            if owns_doc:
+                doc.close()
+
+        return hit_details, total_hits
+
+    def analyze_document_parallel(self, input_path, workers=None, progress_callback=None):
+        """Count pattern hits like analyze_document, with page ranges spread across processes"""
+        with FITZ_LOCK, fitz.open(input_path) as doc:
+            total_pages = len(doc)
+
+        workers = max(1, workers or os.cpu_count() or 1)
+        shard_pages = max(1, min(ANALYSIS_SHARD_PAGES, -(-total_pages // (workers * 4))))
+        jobs = [(input_path, start, min(start + shard_pages, total_pages))
+                for start in range(0, total_pages, shard_pages)]
+
+        page_counts = {index: [] for index in range(len(self.patterns))}
+        done_pages = 0
+
+        with worker_pool(min(workers, len(jobs) or 1), _init_analysis_worker,
+                         (self.patterns,)) as pool:
+            for start, end, counts in pool.imap_unordered(_analyze_page_range, jobs):
+                for index, pages in counts.items():
+                    page_counts[index].extend(pages)
+
+                done_pages += end - start
+                if progress_callback:
+                    progress_callback((done_pages / max(total_pages, 1)) * 100,
+                                      f"Analyzed {done_pages} of {total_pages} pages")
+
+        # Same shape as analyze_document, pages in document order
+        hit_details = {}
+        total_hits = 0
+
+        for index, pattern in enumerate(self.patterns):
+            details = hit_details.setdefault(pattern["label"], {"total": 0, "pages": []})
+
+            for page_number, page_hits in sorted(page_counts[index]):
+                details["total"] += page_hits
+                details["pages"].append({"page": page_number, "hits": page_hits})
+                total_hits += page_hits
+
+        return hit_details, total_hits
+
+    def redact_document(self, input_path, output_path, progress_callback=None):
+        """Redact a PDF file and save the result, returns a summary dict"""
+        use_pii = self.pii_ready()
+        if self.use_pii_detection and not use_pii:
+            print("PII detection unavailable - continuing with pattern-based redaction only")
+
+        # The GUI runs this while prefetch and index threads use MuPDF, so every call takes FITZ_LOCK
+        with FITZ_LOCK:
+            doc = fitz.open(input_path)
+        try:
+            total_pages = len(doc)
+            total_redactions = 0
+
+            for block_start in range(0, total_pages, PII_BATCH_PAGES):
+                # Text of the whole block is read before any of its pages is modified
+                block = range(block_start, min(block_start + PII_BATCH_PAGES, total_pages))
+                block_entities = self._block_entities(doc, block, use_pii)
+
+                for page_num in block:
+                    if progress_callback:
+                        progress_callback((page_num / max(total_pages, 1)) * 90,
+                                          f"Redacting page {page_num + 1} of {total_pages}")
+
+                    with FITZ_LOCK:
+                        page = doc[page_num]
+                    total_redactions += self.redact_page(page, use_pii=use_pii,
+                                                         entities=block_entities.get(page_num))
+
+            if progress_callback:
+                progress_callback(95, "Saving redacted PDF...")
+
+            with FITZ_LOCK:
+                doc.save(output_path, garbage=4, deflate=True, clean=True)
+        finally:
+            with FITZ_LOCK:
+                doc.close()
+
+        if progress_callback:
+            progress_callback(100, "Redaction complete")
+
+        return {
+            "input": input_path,
+            "output": output_path,
+            "pages": total_pages,
+            "redactions": total_redactions
+        }
 
 class SmartRedactorEnhanced:
     def __init__(self):
@@ -1996,6 +4098,19 @@ class SmartRedactorEnhanced:
         self.current_page = 0
         self.total_pages = 0
         self.canvas_img = None
+        
+        # Tiles of the current page when it is too large to render whole
+        self.tile_layout = None
+        self.tile_images = {}
+        self.tile_update_pending = False
+        
+        # Preview layers currently drawn by layer key, with overlay images kept alive for Tk
+        self.highlight_layers = OrderedDict()
+        self.layer_tags = {}
+        self.layer_serial = 0
+        self.overlay_images = {}
+        self.preview_page = None
+        
         self.match_count = tk.StringVar()
         self.redaction_count = 0
         
@@ -2021,6 +4136,25 @@ class SmartRedactorEnhanced:
         # Initialize ultra-precision redactor
         self.redactor = UltraPrecisionRedactor()
         
+        # Documents stay open while viewed instead of being reopened per action
+        self.doc_pool = DocumentPool()
+        
+        # Rendered pages keyed by page and zoom
+        self.render_cache = RenderCache(max_mb=RENDER_CACHE_MB)
+        
+        # Pattern hits per page, shared by preview and background prefetch
+        self.hit_index = HitIndex()
+        self.remote_pii_detector = None
+        self.preview_pipeline = PreviewPipeline(self.hit_index, self.pii_backend())
+        self.preview_scheduler = PreviewScheduler(self.window)
+        
+        # Bumped to stop a background document index run
+        self.index_generation = 0
+        self.analysis_running = False
+        self.prefetcher = BackgroundRenderer(self.render_cache, self.hit_index)
+        self.prefetch_after_id = None
+        self.zoom_renderer = ProgressiveRenderer(self.render_cache)
+        
         # Initialize text selection handler
         self.text_selector = TextSelectionHandler(self)
         
@@ -2432,7 +4566,16 @@ class SmartRedactorEnhanced:
         v_scrollbar = ttk.Scrollbar(canvas_container, orient="vertical", command=self.canvas.yview)
         h_scrollbar = ttk.Scrollbar(canvas_container, orient="horizontal", command=self.canvas.xview)
         
-        self.canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        # Scrolling and resizing also decide which tiles of a large page are needed
+        def on_yscroll(*args):
+            v_scrollbar.set(*args)
+            self.schedule_tile_update()
+            
+        def on_xscroll(*args):
+            h_scrollbar.set(*args)
+            self.schedule_tile_update()
+            
+        self.canvas.configure(yscrollcommand=on_yscroll, xscrollcommand=on_xscroll)
         
         # Pack scrollbars and canvas
         v_scrollbar.pack(side="right", fill="y")
@@ -2489,6 +4632,34 @@ class SmartRedactorEnhanced:
         except Exception as e:
             print(f"Error in pattern type change: {e}")
             
+    def add_pattern(self, label, regex, pattern_type):
+        """Add a pattern, show it in the list and preview only its hits, returns it or None"""
+        # Check for duplicates
+        for existing_pattern in self.patterns:
+            if existing_pattern["label"] == label:
+                messagebox.showwarning("Warning", f"Pattern '{label}' already exists.")
+                return None
+                
+        color = self.generate_random_color()
+        
+        new_pattern = {
+            "label": label,
+            "regex": regex,
+            "color": color,
+            "type": pattern_type
+        }
+        
+        self.patterns.append(new_pattern)
+        self.add_pattern_display(color, label, len(self.patterns) - 1, regex)
+        self.update_pattern_count()
+        
+        # Auto-preview if PDF is loaded
+        if self.pdf_path:
+            self.preview_pattern(new_pattern)
+            self.start_document_index()
+            
+        return new_pattern
+        
     def add_preset_pattern(self):
         """Add a preset pattern - FIXED VERSION"""
         try:
@@ -2502,31 +4673,11 @@ class SmartRedactorEnhanced:
                 messagebox.showerror("Error", "Invalid pattern selected.")
                 return
             
-            # Check for duplicates
-            for existing_pattern in self.patterns:
-                if existing_pattern["label"] == pattern_name:
-                    messagebox.showwarning("Warning", f"Pattern '{pattern_name}' already exists.")
-                    return
-        
-            pattern = PREDEFINED_PATTERNS[pattern_name]
-            color = self.generate_random_color()
-        
-            new_pattern = {
-                "label": pattern_name,
-                "regex": pattern,
-                "color": color,
-                "type": "preset"
-            }
-        
-            self.patterns.append(new_pattern)
-            self.add_pattern_display(color, pattern_name, len(self.patterns) - 1, pattern)
-            self.update_pattern_count()
+            if not self.add_pattern(pattern_name, PREDEFINED_PATTERNS[pattern_name], "preset"):
+                return
+                
             self.preset_combo.set("")
             self.status_text.set(f"➕ Added preset pattern: {pattern_name}")
-        
-            # Auto-preview if PDF is loaded
-            if self.pdf_path:
-                self.ultra_precise_preview()
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add preset pattern: {str(e)}")
@@ -2567,19 +4718,8 @@ class SmartRedactorEnhanced:
             else:
                 label = pattern_type
             
-            color = self.generate_random_color()
-            
-            new_pattern = {
-                "label": label,
-                "regex": regex,
-                "color": color,
-                "type": "custom"
-            }
-            
-            self.patterns.append(new_pattern)
-            self.add_pattern_display(color, label, len(self.patterns) - 1, regex)
-            
-            self.update_pattern_count()
+            if not self.add_pattern(label, regex, "custom"):
+                return
             
             # Clear inputs
             for entry in self.current_inputs:
@@ -2589,10 +4729,6 @@ class SmartRedactorEnhanced:
             
             self.status_text.set(f"➕ Added custom pattern: {label}")
             
-            # Auto-preview if PDF is loaded
-            if self.pdf_path:
-                self.ultra_precise_preview()
-            
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add custom pattern: {str(e)}")
             
@@ -2645,8 +4781,12 @@ class SmartRedactorEnhanced:
         try:
             if 0 <= index < len(self.patterns):
                 removed_pattern = self.patterns.pop(index)
+                self.forget_pattern_hits(removed_pattern)
+                self.remove_highlight_layer(("pattern", removed_pattern["label"]))
+                self.update_preview_count()
                 self.refresh_patterns_display()
                 self.update_pattern_count()
+                self.restart_pending_preview()
                 self.status_text.set(f"🗑️ Removed pattern: {removed_pattern['label']}")
                 
         except Exception as e:
@@ -2656,11 +4796,28 @@ class SmartRedactorEnhanced:
         """Clear all patterns"""
         if self.patterns:
             if messagebox.askyesno("Confirm", "Are you sure you want to clear all patterns?"):
+                for pattern in self.patterns:
+                    self.remove_highlight_layer(("pattern", pattern["label"]))
+                self.update_preview_count()
                 self.patterns.clear()
+                self.index_generation += 1
+                self.hit_index.clear()
                 self.refresh_patterns_display()
                 self.update_pattern_count()
+                self.restart_pending_preview()
                 self.status_text.set("🗑️ All patterns cleared")
                 
+    def restart_pending_preview(self):
+        """Rerun a waiting or running preview so it no longer draws removed patterns"""
+        if not self.preview_scheduler.pending():
+            return
+            
+        self.preview_scheduler.cancel()
+        if self.patterns or self.use_pii_detection.get():
+            self.ultra_precise_preview()
+        else:
+            self.progress_var.set(0)
+                
     def refresh_patterns_display(self):
         """Refresh the patterns display with proper scrolling"""
         try:
@@ -2693,6 +4850,17 @@ class SmartRedactorEnhanced:
     def on_pii_detection_toggle(self):
         """Handle PII detection toggle"""
         if self.use_pii_detection.get():
+            # The shared NER server holds the models, nothing is loaded here
+            if self.remote_pii_detector is not None:
+                if not self.remote_pii_detector.is_available():
+                    messagebox.showwarning(
+                        "NER Server Unavailable",
+                        f"No NER server answers at {self.remote_pii_detector.address}.\n" +
+                        "Start one with 'serve-ner' and try again."
+                    )
+                    self.use_pii_detection.set(False)
+                return
+                
             if not DEPENDENCIES_LOADED:
                 messagebox.showwarning(
                     "Dependencies Required",
@@ -2715,6 +4883,11 @@ class SmartRedactorEnhanced:
     
     def on_model_change(self, event=None):
         """Handle model selection change"""
+        # With a shared NER server the next request names the model, nothing loads locally
+        if self.remote_pii_detector is not None:
+            self.remote_pii_detector.current_model_name = self.selected_pii_model()
+            return
+
         if self.use_pii_detection.get():
             self.load_model_async(self.pii_model_combo.get())
     
@@ -2789,14 +4962,16 @@ class SmartRedactorEnhanced:
             if not self.pdf_path:
                 return
                 
-            doc = fitz.open(self.pdf_path)
-            self.total_pages = len(doc)
+            with FITZ_LOCK:
+                self.total_pages = len(self.get_document())
             self.current_page = 0
-            doc.close()
             
             self.update_page_display()
             self.display_pdf_page()
             
+            # Hits for every page are ready by the time analysis or redaction needs them
+            self.start_document_index()
+            
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load PDF: {str(e)}")
             
@@ -2806,32 +4981,193 @@ class SmartRedactorEnhanced:
             if not self.pdf_path:
                 return
                 
-            doc = fitz.open(self.pdf_path)
-            page = doc[self.current_page]
+            session = self.doc_pool.get(self.pdf_path)
+            page_rect = session.page_rects[self.current_page]
+                
+            # Very large pages only render what is on screen
+            if PageRenderer.needs_tiles(page_rect, self.zoom):
+                self.display_tiled_page(session, page_rect)
+                return
+                
+            self.tile_layout = None
+            self.tile_images = {}
             
-            # Render page with high quality
-            mat = fitz.Matrix(self.zoom, self.zoom)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
+            # Reuse a previous render of this page at this zoom if there is one
+            cache_key = RenderCache.make_key(session.doc, self.current_page, self.zoom)
+            pil_image = self.render_cache.get(cache_key)
             
-            # Convert to PIL Image
-            img_data = pix.tobytes("ppm")
-            pil_image = Image.open(io.BytesIO(img_data))
+            if pil_image is None:
+                # Show another render of this page scaled to the new zoom until a crisp one is ready
+                pil_image = self.scaled_page_placeholder(session)
+                
+                if pil_image is None:
+                    # Render page with high quality
+                    with FITZ_LOCK:
+                        pil_image = PageRenderer.render(session.page(self.current_page), self.zoom)
+                    self.render_cache.put(cache_key, pil_image)
+                else:
+                    self.request_crisp_render(session)
+            else:
+                self.zoom_renderer.cancel()
             
             # Convert to PhotoImage
             self.canvas_img = ImageTk.PhotoImage(pil_image)
             
             # Clear canvas and display image
+            self.clear_highlights()
             self.canvas.delete("all")
-            self.canvas.create_image(0, 0, anchor="nw", image=self.canvas_img)
+            self.canvas.create_image(0, 0, anchor="nw", image=self.canvas_img, tags="page_image")
+            
+            # Update scroll region
+            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            
+            # Render neighbouring pages while the user looks at this one
+            self.schedule_prefetch()
+            
+        except Exception as e:
+            print(f"Error displaying PDF page: {e}")
+            
+    def display_tiled_page(self, session, page_rect):
+        """Display a large page as tiles rendered for the visible region only"""
+        self.zoom_renderer.cancel()
+        self.cancel_prefetch()
+        
+        self.canvas_img = None
+        self.tile_images = {}
+        self.tile_layout = (session, self.current_page, self.zoom, page_rect)
+        
+        self.clear_highlights()
+        self.canvas.delete("all")
+        self.canvas.configure(scrollregion=(0, 0,
+                                            round(page_rect.width * self.zoom),
+                                            round(page_rect.height * self.zoom)))
+        self.update_visible_tiles()
+        
+    def schedule_tile_update(self):
+        """Update tiles once the canvas view has settled"""
+        if self.tile_layout is None or self.tile_update_pending:
+            return
+            
+        self.tile_update_pending = True
+        self.window.after_idle(self.update_visible_tiles)
+        
+    def update_visible_tiles(self):
+        """Render tiles in and around the visible region and drop the rest"""
+        self.tile_update_pending = False
+        
+        try:
+            if self.tile_layout is None:
+                return
+                
+            session, page_number, zoom, page_rect = self.tile_layout
+            columns = max(1, -(-round(page_rect.width * zoom) // TILE_SIZE))
+            rows = max(1, -(-round(page_rect.height * zoom) // TILE_SIZE))
+            
+            # Visible region in canvas pixels
+            left = self.canvas.canvasx(0)
+            top = self.canvas.canvasy(0)
+            right = self.canvas.canvasx(self.canvas.winfo_width())
+            bottom = self.canvas.canvasy(self.canvas.winfo_height())
+            
+            wanted = set()
+            for row in range(max(0, int(top // TILE_SIZE) - TILE_MARGIN),
+                             min(rows, int(bottom // TILE_SIZE) + TILE_MARGIN + 1)):
+                for column in range(max(0, int(left // TILE_SIZE) - TILE_MARGIN),
+                                    min(columns, int(right // TILE_SIZE) + TILE_MARGIN + 1)):
+                    wanted.add((column, row))
+                    
+            # Tiles that scrolled away are released
+            for tile in list(self.tile_images):
+                if tile not in wanted:
+                    item, _ = self.tile_images.pop(tile)
+                    self.canvas.delete(item)
+                    
+            for column, row in sorted(wanted - set(self.tile_images)):
+                key = RenderCache.make_tile_key(session.doc, page_number, zoom, column, row)
+                pil_image = self.render_cache.get(key)
+                
+                if pil_image is None:
+                    clip = PageRenderer.tile_clip(page_rect, zoom, column, row)
+                    with FITZ_LOCK:
+                        pil_image = PageRenderer.render(session.page(page_number), zoom, clip=clip)
+                    self.render_cache.put(key, pil_image)
+                    
+                tile_image = ImageTk.PhotoImage(pil_image)
+                item = self.canvas.create_image(column * TILE_SIZE, row * TILE_SIZE, anchor="nw",
+                                                image=tile_image, tags="page_image")
+                self.tile_images[(column, row)] = (item, tile_image)
+                
+            # Keep preview highlights above the page
+            self.canvas.tag_lower("page_image")
+            
+        except Exception as e:
+            print(f"Error displaying PDF tiles: {e}")
             
-            # Update scroll region
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def scaled_page_placeholder(self, session):
+        """Scale the closest cached render of the current page to the current zoom"""
+        cached = self.render_cache.nearest(session.doc, self.current_page, self.zoom)
+        if cached is None:
+            return None
+            
+        rect = session.page_rects[self.current_page]
+        size = (max(1, round(rect.width * self.zoom)), max(1, round(rect.height * self.zoom)))
+        return cached.resize(size, Image.BILINEAR)
+        
+    def request_crisp_render(self, session):
+        """Render the current page at the current zoom in the background and swap it in"""
+        page_number, zoom = self.current_page, self.zoom
+        
+        def deliver(image):
+            self.window.after(0, lambda: self.show_crisp_render(page_number, zoom, image))
             
-            doc.close()
+        self.zoom_renderer.request(session, page_number, zoom, deliver)
+        
+    def show_crisp_render(self, page_number, zoom, pil_image):
+        """Replace the scaled placeholder if the page and zoom are still current"""
+        try:
+            if page_number != self.current_page or round(zoom, 3) != round(self.zoom, 3):
+                return
+                
+            # Swap the bitmap only, keeping preview highlights on top
+            self.canvas_img = ImageTk.PhotoImage(pil_image)
+            self.canvas.itemconfig("page_image", image=self.canvas_img)
+            self.canvas.tag_lower("page_image")
             
         except Exception as e:
             print(f"Error displaying PDF page: {e}")
             
+    def schedule_prefetch(self):
+        """Prefetch pages around the current one once paging and zooming have settled"""
+        # Renders queued for an earlier page or zoom would only compete with the current one
+        self.cancel_prefetch()
+        self.prefetch_after_id = self.window.after(PREFETCH_SETTLE_MS, self.start_prefetch)
+        
+    def cancel_prefetch(self):
+        """Drop queued prefetch renders and any prefetch still waiting to start"""
+        self.prefetcher.cancel()
+        if self.prefetch_after_id is not None:
+            self.window.after_cancel(self.prefetch_after_id)
+            self.prefetch_after_id = None
+        
+    def start_prefetch(self):
+        """Prefetch pages around the current one at the current zoom"""
+        self.prefetch_after_id = None
+        if not self.pdf_path:
+            return
+            
+        nearby = []
+        for distance in range(1, PREFETCH_RADIUS + 1):
+            for page_number in (self.current_page + distance, self.current_page - distance):
+                if 0 <= page_number < self.total_pages:
+                    nearby.append(page_number)
+                    
+        self.prefetcher.prefetch(self.doc_pool.get(self.pdf_path), nearby,
+                                 self.zoom, self.patterns)
+            
+    def get_document(self):
+        """Get the open document for the current PDF from the session pool"""
+        return self.doc_pool.get(self.pdf_path).doc
+        
     def update_page_display(self):
         """Update page navigation display"""
         self.page_label.config(text=f"{self.current_page + 1} / {self.total_pages}")
@@ -2895,160 +5231,72 @@ class SmartRedactorEnhanced:
                 
             self.progress_var.set(0)
             self.status_text.set("🔍 Analyzing with ultra-precision...")
-            self.window.update()
             
-            doc = fitz.open(self.pdf_path)
-            page = doc[self.current_page]
+            # Runs off the Tk thread once clicks settle, superseding earlier requests
+            self.preview_scheduler.schedule(self.make_preview_task, self.show_preview_result)
             
-            # Clear previous highlights
-            self.canvas.delete("highlight")
+        except Exception as e:
+            messagebox.showerror("Error", f"Preview failed: {str(e)}")
+            self.progress_var.set(0)
             
-            total_matches = 0
+    def make_preview_task(self):
+        """Snapshot the current page and settings into a preview job for the worker thread"""
+        if not self.pdf_path:
+            return None
+            
+        session = self.doc_pool.get(self.pdf_path)
+        page_number = self.current_page
+        zoom = self.zoom
+        patterns = [dict(pattern) for pattern in self.patterns]
+        use_pii = self.use_pii_detection.get()
+        pii_types = [etype for etype, var in self.pdf_type_vars.items() if var.get()] if use_pii else None
+        pii_threshold = self.pdf_threshold_var.get() if use_pii else 0
+        self.preview_pipeline.pii_detector = self.pii_backend()
+        
+        def task():
+            with FITZ_LOCK:
+                page = session.page(page_number)
+                
+            # Collect hits from patterns, selections and PII once
+            hits = self.preview_pipeline.collect(
+                page, patterns,
+                use_pii=use_pii,
+                pii_types=pii_types,
+                pii_threshold=pii_threshold,
+                entity_color=self.generate_entity_color
+            )
+            layers = PreviewPipeline.layers(hits)
             
-            # Process patterns first
-            pattern_progress = 50 if self.use_pii_detection.get() else 100
-            for i, pattern in enumerate(self.patterns):
-                try:
-                    # Update progress
-                    progress = (i / len(self.patterns)) * pattern_progress
-                    self.progress_var.set(progress)
-                    self.window.update()
-                    
-                    # Validate regex pattern before using
-                    try:
-                        re.compile(pattern["regex"])
-                    except re.error as regex_error:
-                        print(f"Invalid regex in pattern {pattern['label']}: {regex_error}")
-                        continue
-                    
-                    # Find ultra-precise matches
-                    matches = self.redactor.find_ultra_precise_matches(page, pattern["regex"])
-                    
-                    # Draw highlights on canvas
-                    for match in matches:
-                        rect = match['rect']
-                        
-                        # Convert PDF coordinates to canvas coordinates
-                        canvas_x1 = rect.x0 * self.zoom
-                        canvas_y1 = rect.y0 * self.zoom
-                        canvas_x2 = rect.x1 * self.zoom
-                        canvas_y2 = rect.y1 * self.zoom
-                        
-                        # Draw highlight rectangle
-                        if canvas_x2 > canvas_x1 and canvas_y2 > canvas_y1:
-                            self.canvas.create_rectangle(
-                                canvas_x1, canvas_y1, canvas_x2, canvas_y2,
-                                outline=pattern["color"], width=2,
-                                fill=pattern["color"], stipple="gray25",
-                                tags="highlight"
-                            )
-                            total_matches += 1
-                            
-                except Exception as e:
-                    print(f"Error processing pattern {pattern['label']}: {e}")
-                    continue
-                    
-            # Process PII detection if enabled
-            if self.use_pii_detection.get():
-                try:
-                    # Get page text
-                    page_text = page.get_text()
-                    
-                    # Get selected entity types
-                    selected_types = [etype for etype, var in self.pdf_type_vars.items()
-                                    if var.get()]
-                    
-                    # Detect entities
-                    self.progress_var.set(75)
-                    self.window.update()
-                    
-                    entities = self.pii_detector.detect_entities(
-                        page_text,
-                        selected_types
-                    )
-                    
-                    # Filter by threshold
-                    threshold = self.pdf_threshold_var.get()
-                    entities = [ent for ent in entities if ent["score"] >= threshold]
-                    
-                    # Draw highlights for entities
-                    for entity in entities:
-                        try:
-                            # Find text position on page
-                            text_instances = page.search_for(entity["text"])
-                            
-                            for inst in text_instances:
-                                # Convert PDF coordinates to canvas coordinates
-                                canvas_x1 = inst.x0 * self.zoom
-                                canvas_y1 = inst.y0 * self.zoom
-                                canvas_x2 = inst.x1 * self.zoom
-                                canvas_y2 = inst.y1 * self.zoom
-                                
-                                # Generate consistent color for entity type
-                                color = self.generate_entity_color(entity["entity"])
-                                
-                                # Draw highlight rectangle
-                                if canvas_x2 > canvas_x1 and canvas_y2 > canvas_y1:
-                                    self.canvas.create_rectangle(
-                                        canvas_x1, canvas_y1, canvas_x2, canvas_y2,
-                                        outline=color, width=2,
-                                        fill=color, stipple="gray25",
-                                        tags="highlight"
-                                    )
-                                    total_matches += 1
-                                    
-                        except Exception as e:
-                            print(f"Error highlighting entity: {e}")
-                            continue
-                            
-                except Exception as e:
-                    print(f"Error in PII detection: {e}")
-                    
-            # Process patterns first
-            for i, pattern in enumerate(self.patterns):
-                try:
-                    # Update progress
-                    progress = (i / len(self.patterns)) * pattern_progress
-                    self.progress_var.set(progress)
-                    self.window.update()
-                    
-                    # Validate regex pattern before using
-                    try:
-                        re.compile(pattern["regex"])
-                    except re.error as regex_error:
-                        print(f"Invalid regex in pattern {pattern['label']}: {regex_error}")
-                        continue
-                    
-                    # Find ultra-precise matches
-                    matches = self.redactor.find_ultra_precise_matches(page, pattern["regex"])
-                    
-                    # Draw highlights on canvas
-                    for match in matches:
-                        rect = match['rect']
-                        
-                        # Convert PDF coordinates to canvas coordinates
-                        canvas_x1 = rect.x0 * self.zoom
-                        canvas_y1 = rect.y0 * self.zoom
-                        canvas_x2 = rect.x1 * self.zoom
-                        canvas_y2 = rect.y1 * self.zoom
-                        
-                        # Ensure valid rectangle coordinates
-                        if canvas_x2 > canvas_x1 and canvas_y2 > canvas_y1:
-                            # Draw highlight rectangle
-                            self.canvas.create_rectangle(
-                                canvas_x1, canvas_y1, canvas_x2, canvas_y2,
-                                outline=pattern["color"], width=2, fill=pattern["color"],
-                                stipple="gray25", tags="highlight"
-                            )
-                            
-                            total_matches += 1
-                            
-                except Exception as e:
-                    print(f"Error processing pattern {pattern['label']}: {e}")
-                    continue
+            # Dense layers are rasterized here, only the PhotoImage is made on the Tk thread
+            overlays = {layer.key: layer.render(zoom) for layer in layers
+                        if len(layer) >= OVERLAY_MIN_HITS}
             
-            doc.close()
+            return page_number, zoom, layers, overlays
+            
+        return task
+        
+    def show_preview_result(self, result):
+        """Draw a finished preview if it still matches the page and zoom on screen"""
+        try:
+            if isinstance(result, Exception):
+                raise result
+                
+            page_number, zoom, layers, overlays = result
+            if page_number != self.current_page or round(zoom, 3) != round(self.zoom, 3):
+                return
+                
+            # Clear previous highlights
+            self.clear_highlights()
             
+            # Patterns removed while the preview ran are not drawn
+            labels = {pattern["label"] for pattern in self.patterns}
+            for layer in layers:
+                if layer.key[0] == "pattern" and layer.key[1] not in labels:
+                    continue
+                self.draw_highlight_layer(layer, overlays.get(layer.key))
+            self.preview_page = self.current_page
+            total_matches = self.highlight_count()
+                
             # Update display
             self.progress_var.set(100)
             self.match_count.set(f"📊 Found {total_matches} matches on page {self.current_page + 1}")
@@ -3058,6 +5306,95 @@ class SmartRedactorEnhanced:
             messagebox.showerror("Error", f"Preview failed: {str(e)}")
             self.progress_var.set(0)
             
+    def clear_highlights(self):
+        """Remove preview highlights from the canvas"""
+        self.canvas.delete("highlight")
+        self.highlight_layers.clear()
+        self.layer_tags.clear()
+        self.overlay_images.clear()
+        self.preview_page = None
+        
+    def layer_tag(self, key):
+        """Canvas tag shared by all items of one preview layer"""
+        # A counter keeps tags unique after layers are removed
+        if key not in self.layer_tags:
+            self.layer_serial += 1
+            self.layer_tags[key] = f"layer{self.layer_serial}"
+        return self.layer_tags[key]
+        
+    def draw_highlight_layer(self, layer, rendered=None):
+        """Draw a layer of hits, as a single overlay image when it has many"""
+        # Redrawing a layer replaces it
+        self.remove_highlight_layer(layer.key)
+        self.highlight_layers[layer.key] = layer
+        tags = ("highlight", self.layer_tag(layer.key))
+        
+        if rendered is None and len(layer) >= OVERLAY_MIN_HITS:
+            rendered = layer.render(self.zoom)
+        
+        if rendered:
+            left, top, image = rendered
+            overlay = ImageTk.PhotoImage(image)
+            self.overlay_images[layer.key] = overlay
+            self.canvas.create_image(left, top, anchor="nw", image=overlay, tags=tags)
+        else:
+            for x0, y0, x1, y1 in layer.rects:
+                self.canvas.create_rectangle(
+                    x0 * self.zoom, y0 * self.zoom, x1 * self.zoom, y1 * self.zoom,
+                    outline=layer.color, width=2,
+                    fill=layer.color, stipple="gray25",
+                    tags=tags
+                )
+                
+        return len(layer)
+        
+    def remove_highlight_layer(self, key):
+        """Remove one preview layer from the canvas, leaving the others in place"""
+        tag = self.layer_tags.pop(key, None)
+        if tag is not None:
+            self.canvas.delete(tag)
+        self.highlight_layers.pop(key, None)
+        self.overlay_images.pop(key, None)
+        
+    def highlight_count(self):
+        """Number of preview hits currently drawn"""
+        return sum(len(layer) for layer in self.highlight_layers.values())
+        
+    def update_preview_count(self):
+        """Refresh the match count after layers were added or removed"""
+        if self.preview_page == self.current_page:
+            self.match_count.set(f"📊 Found {self.highlight_count()} matches on page {self.current_page + 1}")
+            
+    def preview_pattern(self, pattern):
+        """Add the highlights of one pattern to the preview without rescanning the others"""
+        try:
+            # Without a settled preview on screen there is nothing to add to
+            if self.preview_page != self.current_page or self.preview_scheduler.pending():
+                self.ultra_precise_preview()
+                return
+                
+            with FITZ_LOCK:
+                page = self.get_document()[self.current_page]
+                hits = self.preview_pipeline.collect(page, [pattern])
+            
+            if not hits:
+                self.remove_highlight_layer(("pattern", pattern["label"]))
+            for layer in PreviewPipeline.layers(hits):
+                self.draw_highlight_layer(layer)
+                
+            self.update_preview_count()
+            
+        except Exception as e:
+            print(f"Error previewing pattern {pattern['label']}: {e}")
+            
+    def highlight_at(self, pdf_x, pdf_y):
+        """Label and text of the topmost preview hit at a point, or None"""
+        for layer in reversed(self.highlight_layers.values()):
+            index = layer.hit_test(pdf_x, pdf_y)
+            if index is not None:
+                return layer.label, layer.texts[index]
+        return None
+        
     def apply_redaction(self):
         """Apply ultra-precise redaction with PII detection"""
         try:
@@ -3088,98 +5425,43 @@ class SmartRedactorEnhanced:
             self.status_text.set("🔒 Applying ultra-precise redaction...")
             self.window.update()
             
-            doc = fitz.open(self.pdf_path)
-            total_redactions = 0
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Update progress
-                base_progress = (page_num / len(doc)) * 90
-                self.progress_var.set(base_progress)
+            use_pii = self.use_pii_detection.get()
+            if use_pii and self.remote_pii_detector is None:
+                if not DEPENDENCIES_LOADED:
+                    messagebox.showwarning("PII Detection Unavailable",
+                        "PII detection requires additional dependencies.\n" +
+                        "Please install them from the Text De-identification tab.")
+                    use_pii = False
+                elif not self.pii_detector.ensure_initialized():
+                    messagebox.showwarning("PII Detection Error",
+                        "Failed to initialize PII detection.\n" +
+                        "Continuing with pattern-based redaction only.")
+                    use_pii = False
+
+            engine = self.create_redaction_engine(use_pii)
+
+            # Without a loaded model PII would silently stay in the output
+            if use_pii and not engine.pii_ready():
+                if not self.patterns:
+                    messagebox.showerror("PII Detection Error",
+                        "The PII model is not loaded yet.\n" +
+                        "Wait for it to finish loading and try again.")
+                    self.status_text.set("Redaction cancelled - PII model not loaded")
+                    return
+                if not messagebox.askyesno("PII Detection Error",
+                        "The PII model is not loaded yet, so PII will NOT be redacted.\n" +
+                        "Continue with pattern-based redaction only?"):
+                    self.status_text.set("Redaction cancelled - PII model not loaded")
+                    return
+                engine = self.create_redaction_engine(False)
+
+            def report_progress(progress, message):
+                self.progress_var.set(progress)
                 self.window.update()
-                
-                # Process patterns
-                if self.patterns:
-                    for pattern in self.patterns:
-                        try:
-                            # Find ultra-precise matches
-                            matches = self.redactor.find_ultra_precise_matches(page, pattern["regex"])
-                            
-                            # Apply redaction
-                            redaction_count = self.redactor.apply_ultra_precise_redaction(page, matches)
-                            total_redactions += redaction_count
-                            
-                        except Exception as e:
-                            print(f"Error redacting pattern {pattern['label']} on page {page_num + 1}: {e}")
-                            continue
-                
-                # Process PII detection
-                if self.use_pii_detection.get():
-                    if not DEPENDENCIES_LOADED:
-                        messagebox.showwarning("PII Detection Unavailable",
-                            "PII detection requires additional dependencies.\n" +
-                            "Please install them from the Text De-identification tab.")
-                        continue
-                        
-                    if not self.pii_detector.ensure_initialized():
-                        messagebox.showwarning("PII Detection Error",
-                            "Failed to initialize PII detection.\n" +
-                            "Continuing with pattern-based redaction only.")
-                        continue
-                        
-                    try:
-                        # Get page text
-                        page_text = page.get_text()
-                        
-                        # Get selected entity types
-                        selected_types = [etype for etype, var in self.pdf_type_vars.items()
-                                        if var.get()]
-                        
-                        # Update progress
-                        self.progress_var.set(base_progress + 5)
-                        self.window.update()
-                        
-                        # Detect entities
-                        entities = self.pii_detector.detect_entities(
-                            page_text,
-                            selected_types
-                        )
-                        
-                        # Filter by threshold
-                        threshold = self.pdf_threshold_var.get()
-                        entities = [ent for ent in entities if ent["score"] >= threshold]
-                        
-                        # Apply redactions for entities
-                        for entity in entities:
-                            try:
-                                # Find text position on page
-                                text_instances = page.search_for(entity["text"])
-                                
-                                for inst in text_instances:
-                                    # Create redaction annotation
-                                    page.add_redact_annot(inst, fill=(0, 0, 0))
-                                    total_redactions += 1
-                                    
-                            except Exception as e:
-                                print(f"Error redacting entity: {e}")
-                                continue
-                                
-                    except Exception as e:
-                        print(f"Error in PII detection on page {page_num + 1}: {e}")
-                
-                # Apply redactions to page
-                page.apply_redactions()
-            
-            # Save redacted PDF
-            self.progress_var.set(95)
-            self.status_text.set("💾 Saving redacted PDF...")
-            self.window.update()
-            
-            # OLD: doc.save(output_path)
-            # NEW: Use incremental save to preserve file size
-            doc.save(output_path, garbage=4, deflate=True, clean=True)
-            doc.close()
+
+            result = engine.redact_document(self.pdf_path, output_path,
+                                            progress_callback=report_progress)
+            total_redactions = result["redactions"]
             
             self.progress_var.set(100)
             self.redaction_count = total_redactions
@@ -3205,6 +5487,72 @@ class SmartRedactorEnhanced:
             messagebox.showerror("Error", f"Redaction failed: {str(e)}")
             self.progress_var.set(0)
             
+    def create_redaction_engine(self, use_pii=False):
+        """Build a headless redaction engine from the current UI state"""
+        selected_types = None
+        threshold = self.pii_detector.threshold
+
+        if use_pii:
+            selected_types = [etype for etype, var in self.pdf_type_vars.items()
+                            if var.get()]
+            threshold = self.pdf_threshold_var.get()
+
+        return RedactionEngine(
+            patterns=self.patterns,
+            pii_detector=self.pii_backend(),
+            use_pii_detection=use_pii,
+            pii_types=selected_types,
+            pii_threshold=threshold,
+            hit_index=self.hit_index
+        )
+
+    def pii_backend(self):
+        """Detector for PII preview and redaction, the shared NER server when one is configured"""
+        if os.environ.get(NER_SERVER_ENV) is None:
+            return self.pii_detector
+            
+        # The server loads whichever model is selected here
+        model_name = self.selected_pii_model()
+        if self.remote_pii_detector is None:
+            self.remote_pii_detector = RemotePIIDetector(
+                model_name, parse_ner_address(os.environ[NER_SERVER_ENV]), self.pii_detector.threshold)
+        self.remote_pii_detector.current_model_name = model_name
+        return self.remote_pii_detector
+
+    def selected_pii_model(self):
+        """Model chosen in the model selector, falling back to the local detector's model"""
+        combo = getattr(self, 'pii_model_combo', None)
+        model_name = combo.get() if combo is not None else None
+        return model_name or self.pii_detector.current_model_name or "spaCy/en_core_web_lg"
+        
+    def start_document_index(self):
+        """Index all pages for the current patterns in the background, replacing any earlier run"""
+        self.index_generation += 1
+        
+        if not self.pdf_path or not self.patterns:
+            return
+            
+        generation = self.index_generation
+        session = self.doc_pool.get(self.pdf_path)
+        patterns = [dict(pattern) for pattern in self.patterns]
+        
+        def run():
+            try:
+                self.hit_index.index_document(
+                    session, patterns,
+                    should_continue=lambda: generation == self.index_generation)
+            except Exception as e:
+                print(f"Error indexing document: {e}")
+                
+        threading.Thread(target=run, daemon=True).start()
+        
+    def forget_pattern_hits(self, pattern):
+        """Drop indexed hits of a removed pattern unless another pattern uses the same regex"""
+        if not any(other["regex"] == pattern["regex"] for other in self.patterns):
+            # Restarting stops a run that still scans for the removed pattern
+            self.hit_index.invalidate_pattern(pattern["regex"])
+            self.start_document_index()
+
     def analyze_hits(self):
         """Analyze pattern hits across all pages"""
         try:
@@ -3216,46 +5564,61 @@ class SmartRedactorEnhanced:
                 messagebox.showwarning("Warning", "Please add at least one pattern.")
                 return
                 
+            if self.analysis_running:
+                self.status_text.set("📊 Analysis already running...")
+                return
+                
             self.progress_var.set(0)
             self.status_text.set("📊 Analyzing hits across all pages...")
             self.window.update()
             
-            doc = fitz.open(self.pdf_path)
-            self.hit_details = {}
-            self.total_hits = 0
+            engine = self.create_redaction_engine()
+            document = self.get_document()
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Update progress
-                progress = (page_num / len(doc)) * 100
+            # Long documents not yet indexed are split across worker processes
+            if ((os.cpu_count() or 1) > 1 and self.total_pages >= PARALLEL_ANALYSIS_MIN_PAGES and
+                    not self.hit_index.covers(document, self.total_pages, engine.patterns)):
+                self.analyze_hits_parallel(engine)
+                return
+            
+            def report_progress(progress, message):
                 self.progress_var.set(progress)
                 self.window.update()
-                
-                for pattern in self.patterns:
-                    pattern_label = pattern["label"]
-                    
-                    if pattern_label not in self.hit_details:
-                        self.hit_details[pattern_label] = {"total": 0, "pages": []}
-                    
-                    try:
-                        # Find matches on this page
-                        matches = self.redactor.find_ultra_precise_matches(page, pattern["regex"])
-                        page_hits = len(matches)
-                        
-                        if page_hits > 0:
-                            self.hit_details[pattern_label]["total"] += page_hits
-                            self.hit_details[pattern_label]["pages"].append({
-                                "page": page_num + 1,
-                                "hits": page_hits
-                            })
-                            self.total_hits += page_hits
-                            
-                    except Exception as e:
-                        print(f"Error analyzing pattern {pattern_label} on page {page_num + 1}: {e}")
-                        continue
+
+            self.finish_hit_analysis(engine.analyze_document(
+                document, progress_callback=report_progress))
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Hit analysis failed: {str(e)}")
+            self.progress_var.set(0)
+            
+    def analyze_hits_parallel(self, engine):
+        """Run hit analysis in a process pool, streaming progress back to the UI"""
+        self.analysis_running = True
+        pdf_path = self.pdf_path
+        
+        def report_progress(progress, message):
+            self.window.after(0, lambda: (self.progress_var.set(progress),
+                                          self.status_text.set(f"📊 {message}...")))
+            
+        def run():
+            try:
+                result = engine.analyze_document_parallel(pdf_path, progress_callback=report_progress)
+            except Exception as e:
+                result = e
+            self.window.after(0, lambda: self.finish_hit_analysis(result))
             
-            doc.close()
+        threading.Thread(target=run, daemon=True).start()
+        
+    def finish_hit_analysis(self, result):
+        """Show the result of a hit analysis"""
+        self.analysis_running = False
+        
+        try:
+            if isinstance(result, Exception):
+                raise result
+                
+            self.hit_details, self.total_hits = result
             
             # Display analysis results
             self.display_hit_analysis()
@@ -3303,6 +5666,26 @@ class SmartRedactorEnhanced:
             # Clear any loaded models
             if hasattr(self, 'pii_detector'):
                 self.pii_detector.models.clear()
+
+            # Drop cached page text
+            PAGE_TEXT_CACHE.clear()
+            
+            # Stop background work before documents are closed
+            self.index_generation = getattr(self, 'index_generation', 0) + 1
+            if hasattr(self, 'prefetcher'):
+                self.prefetcher.stop()
+            if hasattr(self, 'zoom_renderer'):
+                self.zoom_renderer.stop()
+            if hasattr(self, 'preview_scheduler'):
+                self.preview_scheduler.stop()
+            
+            # Close open documents
+            if hasattr(self, 'doc_pool'):
+                self.doc_pool.close_all()
+            
+            # Release rendered pages
+            if hasattr(self, 'render_cache'):
+                self.render_cache.clear()
             
             # Clear any temporary files
             import tempfile
@@ -3339,7 +5722,457 @@ class SmartRedactorEnhanced:
                                f"An unexpected error occurred: {str(e)}")
             self.cleanup()
 
+def load_pattern_file(path):
+    """Load patterns and PII settings from a JSON or plain-text pattern file"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    pii_settings = {"enabled": False}
+
+    if path.lower().endswith(".json"):
+        data = json.loads(content)
+        if isinstance(data, dict):
+            patterns = data.get("patterns", [])
+            pii_settings.update(data.get("pii", {}))
+        else:
+            patterns = data
+    else:
+        # One preset name or regex per line, '#' starts a comment line
+        patterns = [line.strip() for line in content.splitlines()
+                    if line.strip() and not line.strip().startswith("#")]
+
+    return RedactionEngine.normalize_patterns(patterns), pii_settings
+
+def collect_input_files(inputs, output_dir, recursive=False):
+    """Expand files, directories and globs into (input, output) path pairs"""
+    jobs = []
+    seen = set()
+    outputs = {}
+
+    for item in inputs:
+        if os.path.isdir(item):
+            search = os.path.join(item, "**", "*.pdf") if recursive else os.path.join(item, "*.pdf")
+            base_dir = item
+            matches = glob.glob(search, recursive=recursive)
+        else:
+            # Keep the layout below the part of a glob that has no wildcards
+            base_dir = glob_base_dir(item) if glob.has_magic(item) else None
+            matches = glob.glob(item, recursive=recursive) or ([item] if os.path.isfile(item) else [])
+
+        for input_path in sorted(matches):
+            if not os.path.isfile(input_path) or not input_path.lower().endswith(".pdf"):
+                continue
+
+            abs_path = os.path.abspath(input_path)
+            if abs_path in seen:
+                continue
+            seen.add(abs_path)
+
+            if base_dir:
+                relative = os.path.relpath(input_path, base_dir)
+            else:
+                relative = os.path.basename(input_path)
+
+            output_path = os.path.join(output_dir, relative)
+            output_key = os.path.normcase(os.path.abspath(output_path))
+            if output_key in outputs:
+                raise ValueError(f"{input_path} and {outputs[output_key]} would both be "
+                                 f"written to {output_path}")
+            outputs[output_key] = input_path
+
+            jobs.append((input_path, output_path))
+
+    return jobs
+
+def glob_base_dir(pattern):
+    """Directory part of a glob pattern before its first wildcard"""
+    parts = []
+    for part in pattern.replace("\\", "/").split("/"):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+def worker_pool(processes, initializer, initargs):
+    """Process pool whose workers start from a fresh interpreter"""
+    import multiprocessing
+
+    # Forking while prefetch or index threads hold FITZ_LOCK or a cache lock would
+    # leave the child with a lock nobody releases
+    return multiprocessing.get_context("spawn").Pool(processes=processes,
+                                                     initializer=initializer,
+                                                     initargs=initargs)
+
+# Per-process engine used by the batch worker pool
+_BATCH_ENGINE = None
+_BATCH_DRY_RUN = False
+_BATCH_PLAN_TEXT = False
+
+def plan_output_path(output_path):
+    """Where a dry run writes the plan for an output PDF"""
+    return os.path.splitext(output_path)[0] + ".plan.json"
+
+def _init_batch_worker(patterns, pii_settings, dry_run=False, plan_text=False):
+    """Build one RedactionEngine per worker process"""
+    global _BATCH_ENGINE, _BATCH_DRY_RUN, _BATCH_PLAN_TEXT
+
+    _BATCH_DRY_RUN = dry_run
+    _BATCH_PLAN_TEXT = plan_text
+
+    detector = None
+    use_pii = bool(pii_settings.get("enabled"))
+
+    if use_pii:
+        try:
+            model_name = pii_settings.get("model", "spaCy/en_core_web_lg")
+
+            # With a shared server the models are loaded once, not once per worker
+            if pii_settings.get("server") is not None:
+                detector = RemotePIIDetector(model_name, parse_ner_address(pii_settings["server"]),
+                                             pii_settings.get("threshold", 0.35))
+                if not detector.is_available():
+                    raise RuntimeError("NER server is not reachable")
+            else:
+                detector = PIIDetector(interactive=False)
+                if not detector.is_available() or not detector.initialize_models(model_name):
+                    raise RuntimeError(f"could not load {model_name}")
+        except Exception as e:
+            print(f"PII detection disabled in worker {os.getpid()}: {e}")
+            detector = None
+            use_pii = False
+
+    _BATCH_ENGINE = RedactionEngine(
+        patterns=patterns,
+        pii_detector=detector,
+        use_pii_detection=use_pii,
+        pii_types=pii_settings.get("types"),
+        pii_threshold=pii_settings.get("threshold", 0.35)
+    )
+
+def _redact_batch_file(job):
+    """Redact one document inside a worker process"""
+    input_path, output_path = job
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+        if _BATCH_DRY_RUN:
+            plans = _BATCH_ENGINE.plan_document(input_path)
+            plan_path = plan_output_path(output_path)
+            with open(plan_path, "w", encoding="utf-8") as f:
+                json.dump({"input": input_path,
+                           "pages": [plan.to_dict(_BATCH_PLAN_TEXT) for plan in plans]},
+                          f, indent=1)
+            return {"input": input_path, "output": plan_path, "pages": len(plans),
+                    "redactions": sum(len(plan) for plan in plans)}
+
+        return _BATCH_ENGINE.redact_document(input_path, output_path)
+    except Exception as e:
+        return {"input": input_path, "output": output_path, "error": str(e)}
+
+# Per-process pattern set used by the analysis worker pool
+_ANALYSIS_PATTERN_SET = None
+
+def _init_analysis_worker(patterns):
+    """Compile the patterns once per analysis worker process"""
+    global _ANALYSIS_PATTERN_SET
+    _ANALYSIS_PATTERN_SET = PatternSet(patterns)
+
+def _analyze_page_range(job):
+    """Count hits per pattern on a range of pages, returns (start, end, {index: [(page, hits)]})"""
+    input_path, start, end = job
+    counts = {}
+
+    with fitz.open(input_path) as doc:
+        for page_number in range(start, end):
+            page_hits = UltraPrecisionRedactor.find_pattern_set_matches(doc[page_number],
+                                                                        _ANALYSIS_PATTERN_SET)
+            for index, matches in page_hits.items():
+                if matches:
+                    counts.setdefault(index, []).append((page_number + 1, len(matches)))
+
+    return start, end, counts
+
+def run_batch_redaction(jobs, patterns, pii_settings=None, workers=None, dry_run=False,
+                        plan_text=False):
+    """Spread documents across a process pool, yielding results as they finish"""
+
+    pii_settings = pii_settings or {"enabled": False}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+
+    with worker_pool(workers, _init_batch_worker,
+                     (patterns, pii_settings, dry_run, plan_text)) as pool:
+        for result in pool.imap_unordered(_redact_batch_file, jobs, chunksize=1):
+            yield result
+
+def benchmark_preview_pipeline(input_path, patterns, rounds=3):
+    """Time the preview pipeline over a document and check each page is scanned once per source"""
+    pipeline = PreviewPipeline(HitIndex())
+    sources = sorted({PreviewPipeline.pattern_source(pattern) for pattern in patterns})
+    timings = []
+    total_hits = 0
+
+    doc = fitz.open(input_path)
+    try:
+        total_pages = len(doc)
+
+        for _ in range(rounds):
+            start = time.perf_counter()
+            total_hits = 0
+            for page in doc:
+                total_hits += len(pipeline.collect(page, patterns))
+            timings.append(time.perf_counter() - start)
+    finally:
+        doc.close()
+
+    # Later rounds must be served from the hit index without rescanning
+    problems = [f"page {page_num + 1}: {source} scanned {pipeline.scans.get((source, page_num), 0)} times"
+                for page_num in range(total_pages) for source in sources
+                if pipeline.scans.get((source, page_num), 0) != 1]
+
+    return {
+        "pages": total_pages,
+        "hits": total_hits,
+        "timings": timings,
+        "problems": problems
+    }
+
+def random_glyph_boxes(rng, count, lines, skew):
+    """Random glyph-like boxes on text lines, skew jitters each box's y so rows never line up"""
+    boxes = []
+    for _ in range(count):
+        x0 = rng.uniform(0, 600)
+        y0 = rng.randrange(lines) * 14 + rng.uniform(-skew, skew)
+        boxes.append((x0, y0, x0 + rng.uniform(1, 15), y0 + rng.uniform(8, 12)))
+    return boxes
+
+def benchmark_box_merge(trials=500, size=100000, seed=0):
+    """Check the vectorized box merge against the pure sweep on random layouts and time large pages"""
+    rng = random.Random(seed)
+    problems = []
+
+    for trial in range(trials):
+        boxes = random_glyph_boxes(rng, rng.randint(1, 80), 5, rng.choice((0, 1, 4)))
+        expected = boxes
+        while True:
+            count = len(expected)
+            expected = UltraPrecisionRedactor._merge_sweep(expected)
+            if len(expected) == count:
+                break
+
+        merged = UltraPrecisionRedactor.merge_boxes(boxes)
+        if len(merged) != len(expected) or any(
+                abs(a - b) > 1e-9 for box, other in zip(sorted(merged), sorted(expected))
+                for a, b in zip(box, other)):
+            problems.append(f"trial {trial}: {len(merged)} boxes, expected {len(expected)}")
+
+    timings = {}
+    for name, skew in (("aligned", 0), ("skewed", 1.5)):
+        boxes = random_glyph_boxes(rng, size, max(size // 40, 1), skew)
+        start = time.perf_counter()
+        merged = UltraPrecisionRedactor.merge_boxes(boxes)
+        timings[name] = (time.perf_counter() - start, len(merged))
+
+    return {"trials": trials, "size": size, "timings": timings, "problems": problems}
+
+def benchmark_import_time(repeat=3):
+    """Import this module in fresh interpreters, returns the best time and any heavy NLP modules loaded"""
+    import subprocess
+
+    probe = (
+        "import importlib.util, json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "spec = importlib.util.spec_from_file_location('redaaction_import_probe', sys.argv[1])\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+        "seconds = time.perf_counter() - start\n"
+        "heavy = sorted(name for name in sys.argv[2:] if name in sys.modules)\n"
+        "print(json.dumps({'seconds': seconds, 'heavy': heavy}))\n"
+    )
+
+    timings = []
+    heavy = set()
+
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", probe, os.path.abspath(__file__), *HEAVY_MODULES],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        heavy.update(result["heavy"])
+
+    return {"seconds": min(timings), "timings": timings, "heavy": sorted(heavy)}
+
+def main(argv=None):
+    """Command-line entry point for headless redaction"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="redaaction",
+        description="Smart PDF Redactor - headless batch redaction")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    redact_parser = subparsers.add_parser("redact", help="Redact PDFs in bulk")
+    redact_parser.add_argument("inputs", nargs="+",
+                               help="PDF files, directories or glob patterns")
+    redact_parser.add_argument("-p", "--patterns", required=True,
+                               help="Pattern file (.json or one preset name/regex per line)")
+    redact_parser.add_argument("-o", "--output-dir", required=True,
+                               help="Directory for redacted PDFs")
+    redact_parser.add_argument("-j", "--workers", type=int, default=None,
+                               help="Worker processes (default: all cores)")
+    redact_parser.add_argument("-r", "--recursive", action="store_true",
+                               help="Recurse into input directories")
+    redact_parser.add_argument("--skip-existing", action="store_true",
+                               help="Skip documents whose output already exists")
+    redact_parser.add_argument("--dry-run", action="store_true",
+                               help="Write per-page redaction plans as JSON instead of PDFs")
+    redact_parser.add_argument("--plan-text", action="store_true",
+                               help="Include the matched text in dry-run plans (it is sensitive)")
+    redact_parser.add_argument("--ner-server", nargs="?", const="", default=None, metavar="ADDRESS",
+                               help="Send PII detection to a running 'serve-ner' process "
+                                    "(socket path or host:port, default: local server)")
+
+    serve_parser = subparsers.add_parser("serve-ner",
+                                         help="Keep NER models warm for GUI and batch clients")
+    serve_parser.add_argument("--address", default=None,
+                              help="Socket path or host:port (default: per-user local socket)")
+    serve_parser.add_argument("--model", default=None, choices=list(NLP_MODELS),
+                              help="Model to load at start-up")
+    serve_parser.add_argument("--model-cache-mb", type=int, default=MODEL_CACHE_MB,
+                              help="Memory budget for loaded models before the least recently "
+                                   f"used are unloaded (default: {MODEL_CACHE_MB})")
+
+    bench_parser = subparsers.add_parser("bench-preview",
+                                         help="Benchmark the preview pipeline on a PDF")
+    bench_parser.add_argument("input", help="PDF file")
+    bench_parser.add_argument("-p", "--patterns", required=True,
+                              help="Pattern file (.json or one preset name/regex per line)")
+    bench_parser.add_argument("--rounds", type=int, default=3,
+                              help="Passes over the document (default: 3)")
+
+    merge_parser = subparsers.add_parser("bench-merge",
+                                         help="Check and time merging of redaction boxes")
+    merge_parser.add_argument("--trials", type=int, default=500,
+                              help="Random layouts compared against the pure merge (default: 500)")
+    merge_parser.add_argument("--size", type=int, default=100000,
+                              help="Boxes in each timed layout (default: 100000)")
+    merge_parser.add_argument("--seed", type=int, default=0,
+                              help="Random seed (default: 0)")
+
+    import_parser = subparsers.add_parser("bench-import",
+                                          help="Check that start-up does not import NLP stacks")
+    import_parser.add_argument("--budget", type=float, default=1.0,
+                               help="Maximum import time in seconds (default: 1.0)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "redact":
+        try:
+            patterns, pii_settings = load_pattern_file(args.patterns)
+        except (OSError, ValueError) as e:
+            print(f"Error loading patterns: {e}", file=sys.stderr)
+            return 2
+
+        if not patterns and not pii_settings.get("enabled"):
+            print("No patterns to apply", file=sys.stderr)
+            return 2
+
+        if args.ner_server is not None:
+            pii_settings["server"] = args.ner_server
+
+        try:
+            jobs = collect_input_files(args.inputs, args.output_dir, args.recursive)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        if args.skip_existing:
+            existing = plan_output_path if args.dry_run else (lambda path: path)
+            jobs = [job for job in jobs if not os.path.exists(existing(job[1]))]
+
+        if not jobs:
+            print("No PDF files found", file=sys.stderr)
+            return 1
+
+        failures = 0
+        total_redactions = 0
+
+        for done, result in enumerate(run_batch_redaction(jobs, patterns, pii_settings,
+                                                          args.workers, args.dry_run,
+                                                          args.plan_text), start=1):
+            if "error" in result:
+                failures += 1
+                print(f"[{done}/{len(jobs)}] FAILED {result['input']}: {result['error']}")
+            else:
+                total_redactions += result["redactions"]
+                print(f"[{done}/{len(jobs)}] {result['input']} -> {result['output']} "
+                      f"({result['redactions']} redactions, {result['pages']} pages)")
+
+        print(f"Done: {len(jobs) - failures} redacted, {failures} failed, "
+              f"{total_redactions} total redactions")
+        return 1 if failures else 0
+
+    if args.command == "bench-preview":
+        try:
+            patterns, _ = load_pattern_file(args.patterns)
+        except (OSError, ValueError) as e:
+            print(f"Error loading patterns: {e}", file=sys.stderr)
+            return 2
+
+        result = benchmark_preview_pipeline(args.input, patterns, max(1, args.rounds))
+
+        for round_number, seconds in enumerate(result["timings"], start=1):
+            print(f"Round {round_number}: {seconds * 1000:.1f} ms "
+                  f"({seconds * 1000 / max(result['pages'], 1):.2f} ms/page)")
+        print(f"{result['hits']} hits on {result['pages']} pages")
+
+        for problem in result["problems"]:
+            print(f"FAILED {problem}")
+        return 1 if result["problems"] else 0
+
+    if args.command == "serve-ner":
+        try:
+            serve_ner(parse_ner_address(args.address), args.model, args.model_cache_mb)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"NER server failed: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.command == "bench-merge":
+        result = benchmark_box_merge(max(0, args.trials), max(1, args.size), args.seed)
+
+        for name, (seconds, merged) in result["timings"].items():
+            print(f"{name}: {result['size']} boxes -> {merged} in {seconds * 1000:.1f} ms")
+        print(f"{result['trials'] - len(result['problems'])}/{result['trials']} random layouts "
+              f"match the pure merge")
+
+        for problem in result["problems"]:
+            print(f"FAILED {problem}")
+        return 1 if result["problems"] else 0
+
+    if args.command == "bench-import":
+        result = benchmark_import_time()
+        print(f"Import time: {result['seconds'] * 1000:.0f} ms "
+              f"(runs: {', '.join(f'{seconds * 1000:.0f}' for seconds in result['timings'])} ms)")
+
+        failed = False
+        if result["heavy"]:
+            print(f"FAILED heavy modules imported at start-up: {', '.join(result['heavy'])}")
+            failed = True
+        if result["seconds"] > args.budget:
+            print(f"FAILED import took longer than {args.budget:.2f} s")
+            failed = True
+        return 1 if failed else 0
+
+    return 0
+
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    # Any arguments select the headless command-line interface
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
     # Enable debug output
     import sys
     def debug_print(*args, **kwargs):